@@ -1,28 +1,36 @@
-import re
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import asyncio
+import time
+from dataclasses import dataclass, field
 
-from app.core.database import get_db
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import record_stage, start_request_timings
+from app.core.responses import ORJSONResponse, dumps
 from app.models.schemas import StudyRequest
-from app.services.embeddings import embed
+from app.services.answer_cache import answer_key, get_answer_cache
+from app.services.embeddings import embed, embed_many
+from app.services.references import (
+    ScriptureRange,
+    parse_references,
+    resolve_book,
+    verse_ordinal
+)
 from app.services.retrieval import (
-    retrieve_commentary,
-    retrieve_verses,
-    retrieve_verses_by_reference
+    retrieve_aligned_commentary_async,
+    retrieve_commentary_async,
+    retrieve_passage_async,
+    retrieve_verses_async,
+    retrieve_verses_by_reference_async
 )
-from app.services.rag import build_prompt
-from app.services.llm import ask_llm
+from app.services.rag import PackedContext, build_prompt, pack_context
+from app.services.llm import LLMBusy, ask_llm_async, get_scheduler, stream_llm
 
 router = APIRouter(prefix="/ai", tags=["AI"])
 
 
-def extract_book_chapter(text: str):
-    match = re.search(r"([1-3]?\s?[A-Za-z]+)\s+(\d+)", text)
-    if match:
-        return match.group(1).strip(), int(match.group(2))
-    return None, None
-
-
 def serialize_commentary(rows):
     return [
         {"content": r.content}
@@ -31,17 +39,29 @@ def serialize_commentary(rows):
     ]
 
 
-@router.post("/study")
-def ai_study(
-    request: StudyRequest,
-    db: Session = Depends(get_db)
-):
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+
+@dataclass
+class StudyScope:
+    question_with_ref: str
+    use_passage_scope: bool
+    book: str | None
+    chapter: int | None
+    verse: int | None
+    # References named in the question, grounded verse-for-verse
+    passages: list[ScriptureRange] = field(default_factory=list)
+
+
+def resolve_scope(request: StudyRequest) -> StudyScope:
     question = request.question.strip()
     selected_book = request.book
     selected_chapter = request.chapter
     selected_verse = request.verse
 
-    extracted_book, extracted_chapter = extract_book_chapter(question)
+    passages = parse_references(question)
+    reference = passages[0] if passages else None
 
     q_lower = question.lower()
     reference_terms = [
@@ -58,7 +78,7 @@ def ai_study(
     ]
 
     has_reference_terms = any(term in q_lower for term in reference_terms)
-    has_explicit_reference = extracted_book and extracted_chapter
+    has_explicit_reference = reference is not None
     has_selected_verse = selected_verse is not None
     has_book_in_question = (
         selected_book.lower() in q_lower
@@ -66,7 +86,7 @@ def ai_study(
         else False
     )
 
-    use_passage_scope = (
+    use_passage_scope = bool(
         has_reference_terms
         or has_explicit_reference
         or has_selected_verse
@@ -74,119 +94,368 @@ def ai_study(
     )
 
     if has_explicit_reference:
-        scope_book = extracted_book
-        scope_chapter = extracted_chapter
-        scope_verse = selected_verse
+        scope_book = reference.book
+        scope_chapter = reference.start_chapter
+        scope_verse = reference.start_verse
+        # A selected verse only applies if the question names its chapter
+        if (
+            scope_verse is None
+            and selected_book
+            and resolve_book(selected_book) == reference.book
+            and selected_chapter == reference.start_chapter
+            and reference.start_chapter == reference.end_chapter
+            and selected_verse is not None
+        ):
+            scope_verse = selected_verse
+            passages[0] = ScriptureRange(
+                reference.book,
+                scope_chapter,
+                selected_verse,
+                scope_chapter,
+                selected_verse
+            )
     else:
         scope_book = selected_book
         scope_chapter = selected_chapter
         scope_verse = selected_verse
 
     question_with_ref = question
-    if use_passage_scope and scope_book:
-        reference = scope_book
+    if passages:
+        label = "; ".join(str(p) for p in passages)
+        question_with_ref = f"{question} (Reference: {label})"
+    elif use_passage_scope and scope_book:
+        label = scope_book
         if scope_chapter:
-            reference = f"{reference} {scope_chapter}"
+            label = f"{label} {scope_chapter}"
             if scope_verse:
-                reference = f"{reference}:{scope_verse}"
-        question_with_ref = f"{question} (Reference: {reference})"
+                label = f"{label}:{scope_verse}"
+        question_with_ref = f"{question} (Reference: {label})"
 
-    # ------------------------
-    # 1. Verse-focused retrieval
-    # ------------------------
+    return StudyScope(
+        question_with_ref=question_with_ref,
+        use_passage_scope=use_passage_scope,
+        book=scope_book,
+        chapter=scope_chapter,
+        verse=scope_verse,
+        passages=passages
+    )
+
+
+def aligned_span(scope: StudyScope) -> tuple[int, int] | None:
+    """
+    Ordinal range of the selected verse(s), when commentary aligned to it
+    can be looked up directly.
+    """
+    if not (scope.use_passage_scope and scope.book and scope.chapter and scope.verse):
+        return None
+    if scope.passages and scope.passages[0].start_verse is not None:
+        passage = scope.passages[0]
+        return passage.start_ordinal, passage.end_ordinal
+    ordinal = verse_ordinal(scope.book, scope.chapter, scope.verse)
+    return None if ordinal is None else (ordinal, ordinal)
+
+
+async def gather_context(scope: StudyScope):
+    """
+    Run commentary retrieval and verse grounding concurrently, each on its
+    own AsyncSession (a session can't run two statements at once).
+    """
     commentary_query = f"""
-    Adam Clarke commentary on {question_with_ref}.
+    Adam Clarke commentary on {scope.question_with_ref}.
     Focus on interpretation of the specific verse.
     """
 
-    commentary_embedding = embed(commentary_query)
-    verse_embedding = embed(question_with_ref)
+    embeddings = None
 
-    verse_commentary = retrieve_commentary(
-        db,
-        commentary_embedding,
-        book=scope_book if use_passage_scope else None,
-        chapter=scope_chapter if use_passage_scope else None
+    def get_embeddings():
+        # Started on first use: a verse-aligned lookup may not need them
+        nonlocal embeddings
+        if embeddings is None:
+            embeddings = asyncio.ensure_future(run_in_threadpool(
+                embed_many,
+                [commentary_query, scope.question_with_ref]
+            ))
+        return embeddings
+
+    span = aligned_span(scope)
+    if span is None:
+        get_embeddings()
+
+    async def commentary():
+        async with AsyncSessionLocal() as db:
+            # ------------------------
+            # 1. Verse-focused retrieval: aligned chunks, else vector search
+            # ------------------------
+            verse_commentary = []
+            if span is not None:
+                verse_commentary = await retrieve_aligned_commentary_async(db, *span)
+
+            if not verse_commentary:
+                commentary_embedding, _ = await get_embeddings()
+                verse_commentary = await retrieve_commentary_async(
+                    db,
+                    commentary_embedding,
+                    book=scope.book if scope.use_passage_scope else None,
+                    chapter=scope.chapter if scope.use_passage_scope else None
+                )
+
+            # ------------------------
+            # 2. Chapter-level fallback
+            # ------------------------
+            chapter_commentary = []
+            if (
+                not verse_commentary
+                and scope.use_passage_scope
+                and scope.book
+                and scope.chapter
+            ):
+                chapter_query = f"""
+                Adam Clarke commentary on {scope.book} chapter {scope.chapter}.
+                Focus on doctrine, exposition, and theology of the chapter.
+                """
+                chapter_embedding = await run_in_threadpool(embed, chapter_query)
+                chapter_commentary = await retrieve_commentary_async(
+                    db,
+                    chapter_embedding,
+                    book=scope.book,
+                    chapter=scope.chapter
+                )
+
+        return verse_commentary, chapter_commentary
+
+    async def verses():
+        # ------------------------
+        # 3. Verse grounding (KJV)
+        # ------------------------
+        async with AsyncSessionLocal() as db:
+            if scope.passages:
+                passages = await retrieve_passage_async(db, scope.passages)
+                return [row for rows in passages for row in rows]
+
+            if scope.use_passage_scope and scope.book and scope.chapter:
+                return await retrieve_verses_by_reference_async(
+                    db,
+                    book=scope.book,
+                    chapter=scope.chapter,
+                    verse=scope.verse
+                )
+
+            _, verse_embedding = await get_embeddings()
+            return await retrieve_verses_async(
+                db,
+                verse_embedding,
+                book=None,
+                chapter=None,
+                verse=None,
+                limit=10
+            )
+
+    (verse_commentary, chapter_commentary), verse_rows = await asyncio.gather(
+        commentary(),
+        verses()
     )
 
-    # ------------------------
-    # 2. Chapter-level fallback
-    # ------------------------
-    chapter_commentary = []
-    if not verse_commentary and use_passage_scope and scope_book and scope_chapter:
-        chapter_query = f"""
-        Adam Clarke commentary on {scope_book} chapter {scope_chapter}.
-        Focus on doctrine, exposition, and theology of the chapter.
-        """
-        chapter_embedding = embed(chapter_query)
-        chapter_commentary = retrieve_commentary(
-            db,
-            chapter_embedding,
-            book=scope_book,
-            chapter=scope_chapter
-        )
+    return verse_commentary, chapter_commentary, verse_rows
+
+
+def build_meta(
+    scope: StudyScope,
+    verse_commentary,
+    chapter_commentary,
+    verse_rows,
+    context: PackedContext,
+    cached: bool = False
+):
+    return {
+        "book": scope.book,
+        "chapter": scope.chapter,
+        "verse": scope.verse,
+        "scope": "passage" if scope.use_passage_scope else "global",
+        "verse_commentary_chunks": len(verse_commentary),
+        "chapter_commentary_chunks": len(chapter_commentary),
+        "verse_chunks": len(verse_rows),
+        # What made it into the prompt (the counts above are retrieved)
+        "context": context.meta(),
+        "cached": cached
+    }
 
-    # ------------------------
-    # 3. Verse grounding (KJV)
-    # ------------------------
-    if use_passage_scope and scope_book and scope_chapter:
-        verse_rows = retrieve_verses_by_reference(
-            db,
-            book=scope_book,
-            chapter=scope_chapter,
-            verse=scope_verse
-        )
-    else:
-        verse_rows = retrieve_verses(
-            db,
-            verse_embedding,
-            book=None,
-            chapter=None,
-            verse=None,
-            limit=10
-        )
+
+def build_sources(context: PackedContext):
+    """
+    The commentary and verses the model was actually given.
+    """
+    return {
+        "commentary": (
+            serialize_commentary(context.verse_commentary[:5])
+            if context.verse_commentary
+            else serialize_commentary(context.chapter_commentary[:5])
+        ),
+        "verses": [
+            {
+                "reference": f"{v.book} {v.chapter}:{v.verse}",
+                "text": v.text
+            }
+            for v in context.verses
+        ]
+    }
+
+
+def busy_error(exc: LLMBusy) -> HTTPException:
+    return HTTPException(
+        status_code=exc.status_code,
+        detail=exc.detail,
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+@router.post("/study")
+async def ai_study(request: StudyRequest):
+    timings = start_request_timings() if request.include_timings else None
+    scope = resolve_scope(request)
+
+    verse_commentary, chapter_commentary, verse_rows = await gather_context(scope)
 
     # ------------------------
     # 4. Prompt + LLM
     # ------------------------
-    prompt = build_prompt(
-        question_with_ref,
+    context = pack_context(
+        scope.question_with_ref,
         verse_commentary,
         chapter_commentary,
-        verse_rows
+        verse_rows,
+        focus=(scope.chapter, scope.verse) if scope.chapter and scope.verse else None
     )
+    prompt = build_prompt(scope.question_with_ref, context)
 
-    try:
-        answer = ask_llm(prompt)
-    except Exception as exc:
-        raise HTTPException(
-            status_code=503,
-            detail=f"LLM unavailable: {exc.__class__.__name__}"
-        ) from exc
+    cache = get_answer_cache()
+    cache_key = answer_key(prompt)
+    # The file backend does blocking SQLite I/O; keep it off the event loop
+    answer = await run_in_threadpool(cache.get, cache_key) if cache else None
+    cached = answer is not None
 
-    return {
+    if not cached:
+        try:
+            answer = await ask_llm_async(prompt)
+        except LLMBusy as exc:
+            raise busy_error(exc) from exc
+        except Exception as exc:
+            raise HTTPException(
+                status_code=503,
+                detail=f"LLM unavailable: {exc.__class__.__name__}"
+            ) from exc
+
+        if cache:
+            await run_in_threadpool(cache.set, cache_key, answer)
+
+    meta = build_meta(
+        scope,
+        verse_commentary,
+        chapter_commentary,
+        verse_rows,
+        context,
+        cached=cached
+    )
+    if timings is not None:
+        meta["timings_ms"] = timings
+
+    return ORJSONResponse({
         "answer": answer,
-        "meta": {
-            "book": scope_book,
-            "chapter": scope_chapter,
-            "verse": scope_verse,
-            "scope": "passage" if use_passage_scope else "global",
-            "verse_commentary_chunks": len(verse_commentary),
-            "chapter_commentary_chunks": len(chapter_commentary),
-            "verse_chunks": len(verse_rows)
-        },
-        "sources": {
-            "commentary": (
-                serialize_commentary(verse_commentary[:5])
-                if verse_commentary
-                else serialize_commentary(chapter_commentary[:5])
-            ),
-            "verses": [
-                {
-                    "reference": f"{v.book} {v.chapter}:{v.verse}",
-                    "text": v.text
-                }
-                for v in verse_rows
-            ]
+        "meta": meta,
+        "sources": build_sources(context)
+    })
+
+
+@router.post("/study/stream")
+async def ai_study_stream(request: StudyRequest):
+    """
+    Server-Sent Events version of /ai/study: `meta` and `sources` events as
+    soon as retrieval is done, then `token` events as the answer is
+    generated, then `done` (or `error`).
+    """
+    timings = start_request_timings() if request.include_timings else None
+    scope = resolve_scope(request)
+
+    verse_commentary, chapter_commentary, verse_rows = await gather_context(scope)
+
+    context = pack_context(
+        scope.question_with_ref,
+        verse_commentary,
+        chapter_commentary,
+        verse_rows,
+        focus=(scope.chapter, scope.verse) if scope.chapter and scope.verse else None
+    )
+    prompt = build_prompt(scope.question_with_ref, context)
+
+    cache = get_answer_cache()
+    cache_key = answer_key(prompt)
+    cached_answer = await run_in_threadpool(cache.get, cache_key) if cache else None
+
+    meta = build_meta(
+        scope,
+        verse_commentary,
+        chapter_commentary,
+        verse_rows,
+        context,
+        cached=cached_answer is not None
+    )
+    if timings is not None:
+        meta["timings_ms"] = dict(timings)
+
+    # Reject up front while the status code can still say so; a stream that
+    # is admitted here may still time out in the queue (sent as `error`).
+    if cached_answer is None:
+        try:
+            get_scheduler().check_capacity()
+        except LLMBusy as exc:
+            raise busy_error(exc) from exc
+
+    async def events():
+        yield sse_event("meta", meta)
+        yield sse_event(
+            "sources",
+            build_sources(context)
+        )
+
+        if cached_answer is not None:
+            yield sse_event("token", {"text": cached_answer})
+            yield sse_event("done", {})
+            return
+
+        # If the client goes away, Starlette cancels this generator; closing
+        # `tokens` then aborts the Ollama request so the model stops working.
+        tokens = stream_llm(prompt)
+        parts = []
+        start = time.perf_counter()
+        try:
+            async for token in tokens:
+                if not parts:
+                    record_stage("llm_first_token", time.perf_counter() - start)
+                parts.append(token)
+                yield sse_event("token", {"text": token})
+        except LLMBusy as exc:
+            yield sse_event("error", {"detail": exc.detail, "retry_after": exc.retry_after})
+            return
+        except Exception as exc:
+            yield sse_event(
+                "error",
+                {"detail": f"LLM unavailable: {exc.__class__.__name__}"}
+            )
+            return
+        finally:
+            await tokens.aclose()
+            record_stage("llm", time.perf_counter() - start)
+
+        # Only complete generations are cached
+        if cache:
+            await run_in_threadpool(cache.set, cache_key, "".join(parts))
+
+        yield sse_event("done", {})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
         }
-    }
+    )
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import text
 
 from app.core.database import get_db
+from app.core.http_cache import cached_json
+from app.core.responses import ORJSONResponse
 
 from app.services.embeddings import embed
 from app.services.retrieval import retrieve_commentary
@@ -10,14 +12,16 @@ from app.services.retrieval import retrieve_commentary
 router = APIRouter(prefix="/commentary", tags=["Commentary"])
 
 
-@router.get("/")
-def get_commentary_by_chapter(
+def chapter_commentary(
+    db: Session,
     book: str,
     chapter: int,
-    source: str = "adam_clarke",
-    limit: int = 12,
-    db: Session = Depends(get_db)
+    source: str,
+    limit: int
 ):
+    """
+    Commentary assigned to the chapter by metadata, or None if there is none.
+    """
     sql = text("""
         SELECT
             cd.id,
@@ -37,18 +41,38 @@ def get_commentary_by_chapter(
         "limit": limit
     }).fetchall()
 
-    if rows:
-        return {
-            "commentary": [
-                {
-                    "commentary_id": r.id,
-                    "content": r.content
-                }
-                for r in rows
-            ],
-            "confidence": "high",
-            "mode": "chapter"
-        }
+    if not rows:
+        return None
+
+    return {
+        "commentary": [
+            {
+                "commentary_id": r.id,
+                "content": r.content
+            }
+            for r in rows
+        ],
+        "confidence": "high",
+        "mode": "chapter"
+    }
+
+
+@router.get("/")
+def get_commentary_by_chapter(
+    request: Request,
+    book: str,
+    chapter: int,
+    source: str = "adam_clarke",
+    limit: int = 12,
+    db: Session = Depends(get_db)
+):
+    # Only the chapter path is cached; semantic fallbacks are not
+    response = cached_json(
+        request,
+        lambda: chapter_commentary(db, book, chapter, source, limit)
+    )
+    if response is not None:
+        return response
 
     # Fallback to semantic retrieval if metadata isn't present
     query = f"{book} chapter {chapter} Adam Clarke commentary"
@@ -59,7 +83,7 @@ def get_commentary_by_chapter(
         limit=limit
     )
 
-    return {
+    return ORJSONResponse({
         "commentary": [
             {
                 "commentary_id": i,
@@ -69,4 +93,4 @@ def get_commentary_by_chapter(
         ],
         "confidence": "moderate" if semantic_rows else "none",
         "mode": "semantic"
-    }
+    })
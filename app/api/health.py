@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from app.core.database import get_db
+from app.services.embeddings import embedding_cache_stats
 
 router = APIRouter()
 
@@ -9,3 +10,8 @@ router = APIRouter()
 def db_health(db: Session = Depends(get_db)):
     result = db.execute(text("SELECT 1")).scalar()
     return {"database": "ok", "result": result}
+
+
+@router.get("/health/embeddings")
+def embeddings_health():
+    return {"cache": embedding_cache_stats()}
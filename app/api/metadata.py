@@ -1,111 +1,20 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
 from app.core.database import get_db
+from app.core.http_cache import cached_json
+from app.services.corpus import get_corpus, stored_book_name
+from app.services.references import canonical_sort_key
 
 router = APIRouter(prefix="/metadata", tags=["Metadata"])
 
-CANONICAL_BOOKS = [
-    "Genesis",
-    "Exodus",
-    "Leviticus",
-    "Numbers",
-    "Deuteronomy",
-    "Joshua",
-    "Judges",
-    "Ruth",
-    "1 Samuel",
-    "2 Samuel",
-    "1 Kings",
-    "2 Kings",
-    "1 Chronicles",
-    "2 Chronicles",
-    "Ezra",
-    "Nehemiah",
-    "Esther",
-    "Job",
-    "Psalms",
-    "Proverbs",
-    "Ecclesiastes",
-    "Song of Solomon",
-    "Isaiah",
-    "Jeremiah",
-    "Lamentations",
-    "Ezekiel",
-    "Daniel",
-    "Hosea",
-    "Joel",
-    "Amos",
-    "Obadiah",
-    "Jonah",
-    "Micah",
-    "Nahum",
-    "Habakkuk",
-    "Zephaniah",
-    "Haggai",
-    "Zechariah",
-    "Malachi",
-    "Matthew",
-    "Mark",
-    "Luke",
-    "John",
-    "Acts",
-    "Romans",
-    "1 Corinthians",
-    "2 Corinthians",
-    "Galatians",
-    "Ephesians",
-    "Philippians",
-    "Colossians",
-    "1 Thessalonians",
-    "2 Thessalonians",
-    "1 Timothy",
-    "2 Timothy",
-    "Titus",
-    "Philemon",
-    "Hebrews",
-    "James",
-    "1 Peter",
-    "2 Peter",
-    "1 John",
-    "2 John",
-    "3 John",
-    "Jude",
-    "Revelation",
-]
-
-BOOK_ALIASES = {
-    "psalm": "psalms",
-    "song of songs": "song of solomon",
-    "canticles": "song of solomon",
-    "revelations": "revelation",
-}
-
-
-def normalize_book(name: str) -> str:
-    cleaned = name.replace(".", " ")
-    return " ".join(cleaned.strip().lower().split())
-
-
-CANONICAL_INDEX = {
-    normalize_book(name): index
-    for index, name in enumerate(CANONICAL_BOOKS)
-}
-
-
-def canonical_sort_key(name: str):
-    normalized = normalize_book(name)
-    normalized = BOOK_ALIASES.get(normalized, normalized)
-    index = CANONICAL_INDEX.get(normalized)
-    return (index is None, index if index is not None else 999, name)
 
+def list_books(db: Session, version: str):
+    corpus = get_corpus(version)
+    if corpus is not None:
+        return sorted(corpus.books(), key=canonical_sort_key)
 
-@router.get("/books")
-def get_books(
-    version: str = "KJV",
-    db: Session = Depends(get_db)
-):
     sql = text("""
         SELECT DISTINCT book
         FROM bible_verses
@@ -118,12 +27,11 @@ def get_books(
     return sorted(books, key=canonical_sort_key)
 
 
-@router.get("/chapters")
-def get_chapters(
-    book: str,
-    version: str = "KJV",
-    db: Session = Depends(get_db)
-):
+def list_chapters(db: Session, book: str, version: str):
+    corpus = get_corpus(version)
+    if corpus is not None:
+        return corpus.chapters(book)
+
     sql = text("""
         SELECT DISTINCT chapter
         FROM bible_verses
@@ -132,17 +40,18 @@ def get_chapters(
         ORDER BY chapter
     """)
 
-    rows = db.execute(sql, {"version": version, "book": book}).fetchall()
+    rows = db.execute(sql, {
+        "version": version,
+        "book": stored_book_name(db, book, version)
+    }).fetchall()
     return [r.chapter for r in rows]
 
 
-@router.get("/verses")
-def get_verses(
-    book: str,
-    chapter: int,
-    version: str = "KJV",
-    db: Session = Depends(get_db)
-):
+def list_verse_numbers(db: Session, book: str, chapter: int, version: str):
+    corpus = get_corpus(version)
+    if corpus is not None:
+        return corpus.verse_numbers(book, chapter)
+
     sql = text("""
         SELECT DISTINCT verse
         FROM bible_verses
@@ -154,8 +63,41 @@ def get_verses(
 
     rows = db.execute(sql, {
         "version": version,
-        "book": book,
+        "book": stored_book_name(db, book, version),
         "chapter": chapter
     }).fetchall()
 
     return [r.verse for r in rows]
+
+
+@router.get("/books")
+def get_books(
+    request: Request,
+    version: str = "KJV",
+    db: Session = Depends(get_db)
+):
+    return cached_json(request, lambda: list_books(db, version))
+
+
+@router.get("/chapters")
+def get_chapters(
+    request: Request,
+    book: str,
+    version: str = "KJV",
+    db: Session = Depends(get_db)
+):
+    return cached_json(request, lambda: list_chapters(db, book, version))
+
+
+@router.get("/verses")
+def get_verses(
+    request: Request,
+    book: str,
+    chapter: int,
+    version: str = "KJV",
+    db: Session = Depends(get_db)
+):
+    return cached_json(
+        request,
+        lambda: list_verse_numbers(db, book, chapter, version)
+    )
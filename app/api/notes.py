@@ -1,23 +1,240 @@
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+import binascii
+import codecs
+import csv
+import io
+import json
+import logging
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, ProgrammingError
 
-from app.core.database import get_db
+from app.core.database import SessionLocal, get_async_db, get_db
+from app.core.responses import ORJSONResponse, dumps
 from app.models.schemas import NoteCreate, NoteUpdate
+from app.services.references import ScriptureRange, parse_references
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/notes", tags=["Notes"])
 
+# Bulk import: notes per multi-row INSERT, and per-row errors reported
+IMPORT_BATCH_SIZE = 500
+MAX_IMPORT_ERRORS = 1000
+
+# Every note query selects these columns first, in this order
+NOTE_COLUMNS = ("id", "title", "content", "tags", "verse_ref", "created_at", "updated_at")
+
 
 def serialize_note(row):
-    return {
-        "id": row.id,
-        "title": row.title,
-        "content": row.content,
-        "tags": row.tags,
-        "verse_ref": row.verse_ref,
-        "created_at": row.created_at.isoformat() if row.created_at else None,
-        "updated_at": row.updated_at.isoformat() if row.updated_at else None,
-    }
+    """
+    Note dict straight from the row tuple; timestamps stay datetimes, which
+    orjson writes in ISO 8601.
+    """
+    return dict(zip(NOTE_COLUMNS, row))
+
+
+def note_csv_row(row) -> list:
+    return [
+        value.isoformat() if isinstance(value, datetime) else value
+        for value in row[:len(NOTE_COLUMNS)]
+    ]
+
+
+def normalize_tags(tags: str | None) -> list[str] | None:
+    """
+    Comma-separated tags -> distinct, lowercased list stored in `tag_list`
+    for indexed exact-tag filtering. None means "not provided".
+    """
+    if tags is None:
+        return None
+    normalized = (t.strip().lower() for t in tags.split(","))
+    return list(dict.fromkeys(t for t in normalized if t))
+
+
+def write_note_ranges(db, note_id: int, verse_ref: str | None) -> None:
+    """
+    Replace a note's stored verse ranges with those parsed from
+    `verse_ref` (a note on "John 3:14-18; Num 21:9" gets two ranges).
+    """
+    db.execute(
+        text("DELETE FROM study_note_ranges WHERE note_id = :note_id"),
+        {"note_id": note_id}
+    )
+
+    passages = parse_references(verse_ref) if verse_ref else []
+    if passages:
+        db.execute(
+            text("""
+                INSERT INTO study_note_ranges (note_id, span)
+                VALUES (:note_id, int4range(:start, :end, '[]'))
+            """),
+            [
+                {"note_id": note_id, "start": p.start_ordinal, "end": p.end_ordinal}
+                for p in passages
+            ]
+        )
+
+
+def check_note_ranges() -> None:
+    """
+    Refuse to start while notes with a recognizable verse_ref have no
+    stored ranges (passage filters would silently skip them). Notes whose
+    verse_ref names no reference are only logged. An unreachable database
+    is not fatal; a missing table or column is.
+    """
+    db = SessionLocal()
+    try:
+        rows = db.execute(text("""
+            SELECT n.id, n.verse_ref
+            FROM study_notes n
+            WHERE n.verse_ref IS NOT NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM study_note_ranges r WHERE r.note_id = n.id
+              )
+        """)).fetchall()
+    except OperationalError as exc:
+        # Unreachable database: endpoints will report it per request
+        logger.warning("Note range check skipped: %s", exc.__class__.__name__)
+        return
+    except ProgrammingError as exc:
+        # Undefined table or column: every lookup that needs it would fail
+        raise RuntimeError(
+            "study_note_ranges is missing "
+            f"({exc.orig.__class__.__name__}); create it as in the README's "
+            "Database Tables section and run scripts/backfill_note_ranges.py"
+        ) from exc
+    finally:
+        db.close()
+
+    unindexed = [r.id for r in rows if parse_references(r.verse_ref)]
+    if len(rows) > len(unindexed):
+        logger.warning(
+            "%s notes have a verse_ref with no recognizable reference",
+            len(rows) - len(unindexed)
+        )
+    if unindexed:
+        raise RuntimeError(
+            f"{len(unindexed)} notes have no study_note_ranges rows; "
+            "run scripts/backfill_note_ranges.py"
+        )
+
+
+def overlap_condition(passages: list[ScriptureRange], params: dict) -> str:
+    """
+    SQL condition matching notes with a stored range overlapping any of
+    `passages` (a GiST index scan on study_note_ranges.span).
+    """
+    clauses = []
+    for i, passage in enumerate(passages):
+        clauses.append(f"span && int4range(:start_{i}, :end_{i}, '[]')")
+        params[f"start_{i}"] = passage.start_ordinal
+        params[f"end_{i}"] = passage.end_ordinal
+
+    return f"""id IN (
+        SELECT note_id FROM study_note_ranges
+        WHERE {' OR '.join(clauses)}
+    )"""
+
+
+def encode_cursor(row, rank: float | None = None) -> str:
+    payload = {"u": row.updated_at.isoformat(), "i": row.id}
+    if rank is not None:
+        payload["r"] = rank
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        return {
+            "updated_at": datetime.fromisoformat(payload["u"]),
+            "id": int(payload["i"]),
+            "rank": float(payload["r"]) if "r" in payload else None,
+        }
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/search")
+def search_notes(
+    q: str | None = None,
+    tag: str | None = None,
+    limit: int = 50,
+    cursor: str | None = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Full-text note search ranked by relevance (when `q` is given, otherwise
+    most recently updated first), with exact tag filtering and keyset
+    pagination via an opaque `next_cursor`.
+    """
+    limit = max(1, min(limit, 200))
+    conditions = ["1=1"]
+    params: dict[str, object] = {"limit": limit + 1}
+
+    if tag:
+        conditions.append("tag_list @> ARRAY[CAST(:tag AS text)]")
+        params["tag"] = tag.strip().lower()
+
+    position = decode_cursor(cursor) if cursor else None
+
+    if q:
+        if position and position["rank"] is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+        sql = text(f"""
+            SELECT id, title, content, tags, verse_ref, created_at, updated_at, rank
+            FROM (
+                SELECT id, title, content, tags, verse_ref, created_at, updated_at,
+                       ts_rank_cd(search_vector, query) AS rank
+                FROM study_notes, websearch_to_tsquery('english', :q) AS query
+                WHERE search_vector @@ query
+                  AND {' AND '.join(conditions)}
+            ) ranked
+            {"WHERE (rank, updated_at, id) < (CAST(:rank AS real), :updated_at, :id)" if position else ""}
+            ORDER BY rank DESC, updated_at DESC, id DESC
+            LIMIT :limit
+        """)
+        params["q"] = q
+    else:
+        if position:
+            conditions.append("(updated_at, id) < (:updated_at, :id)")
+
+        sql = text(f"""
+            SELECT id, title, content, tags, verse_ref, created_at, updated_at
+            FROM study_notes
+            WHERE {' AND '.join(conditions)}
+            ORDER BY updated_at DESC, id DESC
+            LIMIT :limit
+        """)
+
+    if position:
+        params["updated_at"] = position["updated_at"]
+        params["id"] = position["id"]
+        if q:
+            params["rank"] = position["rank"]
+
+    rows = db.execute(sql, params).fetchall()
+    page = rows[:limit]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = encode_cursor(last, last.rank if q else None)
+
+    return ORJSONResponse({
+        "notes": [serialize_note(r) for r in page],
+        "next_cursor": next_cursor
+    })
 
 
 @router.get("/")
@@ -36,8 +253,12 @@ def list_notes(
         conditions.append("(title ILIKE :search OR content ILIKE :search)")
         params["search"] = f"%{search}%"
     if verse_ref:
-        conditions.append("verse_ref ILIKE :verse_ref")
-        params["verse_ref"] = f"%{verse_ref}%"
+        passages = parse_references(verse_ref)
+        if passages:
+            conditions.append(overlap_condition(passages, params))
+        else:
+            conditions.append("verse_ref ILIKE :verse_ref")
+            params["verse_ref"] = f"%{verse_ref}%"
     if tag:
         conditions.append("tags ILIKE :tag")
         params["tag"] = f"%{tag}%"
@@ -51,7 +272,254 @@ def list_notes(
     """)
 
     rows = db.execute(sql, params).fetchall()
-    return [serialize_note(r) for r in rows]
+    return ORJSONResponse([serialize_note(r) for r in rows])
+
+
+@router.get("/passage")
+def notes_for_passage(
+    ref: str,
+    limit: int = 200,
+    db: Session = Depends(get_db)
+):
+    """
+    Notes whose verse_ref overlaps any of the given references, e.g.
+    `ref=John 3:16` finds notes on "John 3", "John 3:14-18" and
+    "John 3:16; Rom 5:8" but not "1 John 3" or "John 30".
+    """
+    passages = parse_references(ref)
+    if not passages:
+        raise HTTPException(status_code=400, detail="No scripture reference found")
+
+    params: dict[str, object] = {"limit": max(1, min(limit, 500))}
+    sql = text(f"""
+        SELECT id, title, content, tags, verse_ref, created_at, updated_at
+        FROM study_notes
+        WHERE {overlap_condition(passages, params)}
+        ORDER BY updated_at DESC, id DESC
+        LIMIT :limit
+    """)
+
+    rows = db.execute(sql, params).fetchall()
+    return ORJSONResponse([serialize_note(r) for r in rows])
+
+
+# ------------------------
+# Bulk import / export
+# ------------------------
+
+async def iter_lines(request: Request):
+    """
+    Decoded lines of the request body as it arrives, so imports never hold
+    the whole upload in memory.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in request.stream():
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line + "\n"
+
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+async def iter_ndjson(lines):
+    """
+    (record, error) per non-blank line.
+    """
+    async for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line), None
+        except ValueError as exc:
+            yield None, f"Invalid JSON: {exc}"
+
+
+async def iter_csv(lines):
+    """
+    (record, error) per CSV row, keyed by the header row. Quoted fields
+    may span lines; empty fields are treated as missing.
+    """
+    header = None
+    pending = ""
+    async for line in lines:
+        pending += line
+        # An odd number of quotes means a quoted field continues
+        if pending.count('"') % 2:
+            continue
+
+        record = next(csv.reader([pending]), [])
+        pending = ""
+        if not any(field.strip() for field in record):
+            continue
+
+        if header is None:
+            header = [field.strip().lower() for field in record]
+            continue
+
+        yield {
+            name: value
+            for name, value in zip(header, record)
+            if value != ""
+        }, None
+
+    if pending:
+        yield None, "Unterminated quoted field"
+
+
+def validate_import_row(record) -> tuple[dict | None, str | None]:
+    if not isinstance(record, dict):
+        return None, "Expected an object"
+
+    try:
+        note = NoteCreate.model_validate(record)
+    except ValidationError as exc:
+        return None, "; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+            for error in exc.errors()
+        )
+
+    if not note.title.strip() or not note.content.strip():
+        return None, "Title and content are required"
+
+    return {
+        "title": note.title.strip(),
+        "content": note.content.strip(),
+        "tags": note.tags,
+        "tag_list": normalize_tags(note.tags) or [],
+        "verse_ref": note.verse_ref
+    }, None
+
+
+async def insert_note_batch(db: AsyncSession, notes: list[dict]) -> int:
+    """
+    Insert notes (and their verse ranges) with one multi-row INSERT each.
+    """
+    values, params = [], {}
+    for i, note in enumerate(notes):
+        values.append(
+            f"(:title_{i}, :content_{i}, :tags_{i}, :tag_list_{i}, :verse_ref_{i})"
+        )
+        for name, value in note.items():
+            params[f"{name}_{i}"] = value
+
+    rows = (await db.execute(text(f"""
+        INSERT INTO study_notes (title, content, tags, tag_list, verse_ref)
+        VALUES {', '.join(values)}
+        RETURNING id, verse_ref
+    """), params)).fetchall()
+
+    ranges = [
+        {"note_id": row.id, "start": p.start_ordinal, "end": p.end_ordinal}
+        for row in rows
+        if row.verse_ref
+        for p in parse_references(row.verse_ref)
+    ]
+    if ranges:
+        await db.execute(text("""
+            INSERT INTO study_note_ranges (note_id, span)
+            VALUES (:note_id, int4range(:start, :end, '[]'))
+        """), ranges)
+
+    return len(rows)
+
+
+@router.post("/import")
+async def import_notes(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Bulk-create notes from NDJSON (one NoteCreate object per line) or, with
+    `Content-Type: text/csv`, CSV with a header row. Valid rows are inserted
+    in one transaction; invalid rows are skipped and reported by row number.
+    """
+    content_type = request.headers.get("content-type", "")
+    lines = iter_lines(request)
+    records = iter_csv(lines) if "csv" in content_type else iter_ndjson(lines)
+
+    imported, failed, errors, batch = 0, 0, [], []
+    row_number = 0
+
+    try:
+        async for record, error in records:
+            row_number += 1
+            if error is None:
+                note, error = validate_import_row(record)
+
+            if error is not None:
+                failed += 1
+                if len(errors) < MAX_IMPORT_ERRORS:
+                    errors.append({"row": row_number, "error": error})
+                continue
+
+            batch.append(note)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                imported += await insert_note_batch(db, batch)
+                batch = []
+
+        if batch:
+            imported += await insert_note_batch(db, batch)
+    except UnicodeDecodeError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Body must be UTF-8")
+
+    await db.commit()
+
+    return {"imported": imported, "failed": failed, "errors": errors}
+
+
+def export_chunks(fmt: str):
+    """
+    Yield the export one fetched batch at a time from a server-side cursor,
+    so memory stays flat however large the table is. Runs in the threadpool
+    with its own session, since it outlives the request handler.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(text("""
+            SELECT id, title, content, tags, verse_ref, created_at, updated_at
+            FROM study_notes
+            ORDER BY id
+        """).execution_options(stream_results=True, yield_per=1000))
+
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(NOTE_COLUMNS)
+            for rows in result.partitions():
+                writer.writerows(note_csv_row(r) for r in rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        else:
+            for rows in result.partitions():
+                yield b"".join(dumps(serialize_note(r)) + b"\n" for r in rows)
+    finally:
+        db.close()
+
+
+@router.get("/export")
+def export_notes(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$")
+):
+    """
+    Stream every note as NDJSON (default) or CSV; the output can be fed
+    back to POST /notes/import.
+    """
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_chunks(fmt),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="study_notes.{fmt}"'
+        }
+    )
 
 
 @router.get("/{note_id}")
@@ -69,7 +537,7 @@ def get_note(
     if not row:
         raise HTTPException(status_code=404, detail="Note not found")
 
-    return serialize_note(row)
+    return ORJSONResponse(serialize_note(row))
 
 
 @router.post("/")
@@ -81,8 +549,8 @@ def create_note(
         raise HTTPException(status_code=400, detail="Title and content are required")
 
     sql = text("""
-        INSERT INTO study_notes (title, content, tags, verse_ref)
-        VALUES (:title, :content, :tags, :verse_ref)
+        INSERT INTO study_notes (title, content, tags, tag_list, verse_ref)
+        VALUES (:title, :content, :tags, :tag_list, :verse_ref)
         RETURNING id, title, content, tags, verse_ref, created_at, updated_at
     """)
 
@@ -90,12 +558,14 @@ def create_note(
         "title": payload.title.strip(),
         "content": payload.content.strip(),
         "tags": payload.tags,
+        "tag_list": normalize_tags(payload.tags) or [],
         "verse_ref": payload.verse_ref
     }).fetchone()
 
+    write_note_ranges(db, row.id, row.verse_ref)
     db.commit()
 
-    return serialize_note(row)
+    return ORJSONResponse(serialize_note(row))
 
 
 @router.put("/{note_id}")
@@ -109,6 +579,7 @@ def update_note(
         SET title = COALESCE(:title, title),
             content = COALESCE(:content, content),
             tags = COALESCE(:tags, tags),
+            tag_list = COALESCE(:tag_list, tag_list),
             verse_ref = COALESCE(:verse_ref, verse_ref),
             updated_at = now()
         WHERE id = :id
@@ -120,12 +591,15 @@ def update_note(
         "title": payload.title.strip() if payload.title is not None else None,
         "content": payload.content.strip() if payload.content is not None else None,
         "tags": payload.tags,
+        "tag_list": normalize_tags(payload.tags),
         "verse_ref": payload.verse_ref
     }).fetchone()
 
     if not row:
         raise HTTPException(status_code=404, detail="Note not found")
 
+    if payload.verse_ref is not None:
+        write_note_ranges(db, row.id, row.verse_ref)
     db.commit()
 
-    return serialize_note(row)
+    return ORJSONResponse(serialize_note(row))
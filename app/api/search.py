@@ -0,0 +1,124 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.core.responses import ORJSONResponse
+from app.models.schemas import SearchRequest
+from app.services.embeddings import embed_many
+from app.services.references import (
+    NEW_TESTAMENT_BOOKS,
+    OLD_TESTAMENT_BOOKS,
+    resolve_book
+)
+from app.services.retrieval import search_many
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+# Per request: queries, results per page, and how deep pagination may go
+MAX_QUERIES = 100
+MAX_LIMIT = 50
+MAX_DEPTH = 200
+
+TARGETS = ("verses", "commentary")
+
+TESTAMENTS = {
+    "OT": OLD_TESTAMENT_BOOKS,
+    "NT": NEW_TESTAMENT_BOOKS,
+}
+
+
+def resolve_filter(request: SearchRequest) -> list[str] | None:
+    """
+    Canonical books to search (in canonical order), or None for all.
+    """
+    books = None
+    if request.testament:
+        books = TESTAMENTS.get(request.testament.upper())
+        if books is None:
+            raise HTTPException(status_code=400, detail="testament must be OT or NT")
+        books = list(books)
+
+    if request.book:
+        book = resolve_book(request.book)
+        if book is None:
+            raise HTTPException(status_code=400, detail=f"Unknown book: {request.book}")
+        books = [book] if books is None or book in books else []
+    elif request.chapter:
+        raise HTTPException(status_code=400, detail="chapter requires book")
+
+    return books
+
+
+def serialize_hit(target: str, row) -> dict:
+    if target == "verses":
+        return {
+            "verse_id": row.id,
+            "reference": f"{row.book} {row.chapter}:{row.verse}",
+            "book": row.book,
+            "chapter": row.chapter,
+            "verse": row.verse,
+            "text": row.text,
+            "score": round(float(row.score), 4)
+        }
+    return {
+        "commentary_id": row.id,
+        "book": row.book,
+        "chapter": row.chapter,
+        "content": row.content,
+        "score": round(float(row.score), 4)
+    }
+
+
+@router.post("/")
+def search(
+    request: SearchRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Semantic search for a batch of queries over verses and/or commentary.
+    All queries are embedded in one model pass and each target is searched
+    for all of them at once. Results are paged per query with `offset` and
+    `limit`; `next_offset` is null on the last page.
+    """
+    queries = [q.strip() for q in request.queries]
+    if not queries or not all(queries):
+        raise HTTPException(status_code=400, detail="queries must be non-empty strings")
+    if len(queries) > MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_QUERIES} queries per request"
+        )
+
+    targets = list(dict.fromkeys(request.targets))
+    if not targets or any(t not in TARGETS for t in targets):
+        raise HTTPException(status_code=400, detail="targets must be verses and/or commentary")
+
+    limit = max(1, min(request.limit, MAX_LIMIT))
+    offset = max(0, request.offset)
+    if offset + limit > MAX_DEPTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"offset + limit may not exceed {MAX_DEPTH}"
+        )
+
+    books = resolve_filter(request)
+
+    results = [
+        {"query": q, **{target: [] for target in targets}, "next_offset": None}
+        for q in queries
+    ]
+    if books == []:
+        # e.g. a New Testament book with testament=OT
+        return ORJSONResponse({"results": results})
+
+    embeddings = embed_many(queries)
+    for target in targets:
+        # One extra row tells whether another page exists
+        hits = search_many(db, target, embeddings, offset + limit + 1, books, request.chapter)
+        for result, rows in zip(results, hits):
+            page = rows[offset:offset + limit]
+            result[target] = [serialize_hit(target, row) for row in page]
+            if len(rows) > offset + limit:
+                result["next_offset"] = offset + limit
+
+    return ORJSONResponse({"results": results})
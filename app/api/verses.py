@@ -1,21 +1,64 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.http_cache import cached_json
+from app.services.corpus import get_corpus, stored_book_name
+from app.services.references import parse_references, split_ordinal
+from app.services.retrieval import retrieve_parallel, retrieve_passage, retrieve_similar
 
 router = APIRouter(
     prefix="/verses",
     tags=["Verses"]
 )
 
-@router.get("/")
-def get_verses(
+# Upper bound on references per /verses/passage request
+MAX_PASSAGES = 50
+# Upper bound on versions per /verses/parallel request
+MAX_VERSIONS = 8
+
+
+def serialize_verses(rows):
+    # Rows are (id, book, chapter, verse, text, ...) from SQL or the corpus
+    return [
+        {
+            "verse_id": verse_id,
+            "reference": f"{book} {chapter}:{verse}",
+            "book": book,
+            "chapter": chapter,
+            "verse": verse,
+            "text": verse_text
+        }
+        for verse_id, book, chapter, verse, verse_text, *_ in rows
+    ]
+
+
+def similar_verses(db: Session, verse_id: int, limit: int):
+    rows = retrieve_similar(db, verse_id, limit)
+    if not rows:
+        return None
+    return {
+        "verse_id": verse_id,
+        "similar": [
+            {**verse, "score": round(float(row.score), 4)}
+            for verse, row in zip(serialize_verses(rows), rows)
+        ]
+    }
+
+
+def chapter_verses(
+    db: Session,
     book: str,
     chapter: int,
-    verse: int | None = None,
-    version: str = "KJV",
-    db: Session = Depends(get_db)
+    verse: int | None,
+    version: str
 ):
+    corpus = get_corpus(version)
+    if corpus is not None:
+        rows = corpus.verses(book, chapter, verse)
+        return serialize_verses(rows)
+
     sql = text(f"""
         SELECT
             id,
@@ -33,22 +76,147 @@ def get_verses(
 
     params = {
         "version": version,
-        "book": book,
+        "book": stored_book_name(db, book, version),
         "chapter": chapter
     }
     if verse:
         params["verse"] = verse
 
     rows = db.execute(sql, params).fetchall()
+    return serialize_verses(rows)
 
-    return [
-        {
-            "verse_id": r.id,
-            "reference": f"{r.book} {r.chapter}:{r.verse}",
-            "book": r.book,
-            "chapter": r.chapter,
-            "verse": r.verse,
-            "text": r.text
+
+def serialize_parallel(ordinal: int, rows: dict, versions: list[str]):
+    book, chapter, verse = split_ordinal(ordinal)
+    return {
+        "reference": f"{book} {chapter}:{verse}",
+        "book": book,
+        "chapter": chapter,
+        "verse": verse,
+        "text": {
+            version: rows[version].text if version in rows else None
+            for version in versions
         }
-        for r in rows
-    ]
+    }
+
+
+def parse_passages(ref: str):
+    passages = parse_references(ref)
+    if not passages:
+        raise HTTPException(status_code=400, detail="No scripture reference found")
+    if len(passages) > MAX_PASSAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_PASSAGES} references per request"
+        )
+    return passages
+
+
+@router.get("/")
+def get_verses(
+    request: Request,
+    book: str,
+    chapter: int,
+    verse: int | None = None,
+    version: str = "KJV",
+    db: Session = Depends(get_db)
+):
+    return cached_json(
+        request,
+        lambda: chapter_verses(db, book, chapter, verse, version)
+    )
+
+
+@router.get("/passage")
+def get_passage(
+    request: Request,
+    ref: str,
+    version: str = "KJV",
+    db: Session = Depends(get_db)
+):
+    """
+    Verses for one or more references in a single round-trip, e.g.
+    `ref=John 3:16-4:2; Rom 8:28`. Each reference is returned with its
+    verses in canonical order.
+    """
+    passages = parse_passages(ref)
+
+    def build():
+        results = retrieve_passage(db, passages, version)
+        return {
+            "passages": [
+                {
+                    "reference": str(passage),
+                    "verses": serialize_verses(rows)
+                }
+                for passage, rows in zip(passages, results)
+            ]
+        }
+
+    # Size is up to the client: ETag/304 only, not precompressed or kept
+    return cached_json(request, build, store=False)
+
+
+@router.get("/parallel")
+def get_parallel(
+    request: Request,
+    ref: str,
+    versions: str = "KJV",
+    db: Session = Depends(get_db)
+):
+    """
+    Several versions side by side, e.g. `ref=John 3:16-21&versions=KJV,WEB`:
+    each verse of each reference once, with its text per version (null
+    where a version lacks the verse), from a single query.
+    """
+    passages = parse_passages(ref)
+    codes = list(dict.fromkeys(v.strip() for v in versions.split(",") if v.strip()))
+    if not codes:
+        raise HTTPException(status_code=400, detail="No versions given")
+    if len(codes) > MAX_VERSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_VERSIONS} versions per request"
+        )
+
+    def build():
+        results = retrieve_parallel(db, passages, codes)
+        return {
+            "versions": codes,
+            "passages": [
+                {
+                    "reference": str(passage),
+                    "verses": [
+                        serialize_parallel(ordinal, by_version, codes)
+                        for ordinal, by_version in rows
+                    ]
+                }
+                for passage, rows in zip(passages, results)
+            ]
+        }
+
+    # Size is up to the client: ETag/304 only, not precompressed or kept
+    return cached_json(request, build, store=False)
+
+
+@router.get("/{verse_id}/similar")
+def get_similar(
+    request: Request,
+    verse_id: int,
+    limit: int = 10,
+    db: Session = Depends(get_db)
+):
+    """
+    Verses closest in meaning to a KJV verse, best first, precomputed by
+    scripts/build_similar_verses.py (404 if the verse has none stored).
+    """
+    if not 1 <= limit <= settings.SIMILAR_VERSES_K:
+        raise HTTPException(
+            status_code=400,
+            detail=f"limit must be between 1 and {settings.SIMILAR_VERSES_K}"
+        )
+
+    response = cached_json(request, lambda: similar_verses(db, verse_id, limit))
+    if response is None:
+        raise HTTPException(status_code=404, detail="No similar verses for this verse")
+    return response
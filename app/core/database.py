@@ -1,10 +1,39 @@
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.core.config import settings
+from app.core.metrics import DB_POOL_WAIT_SECONDS, register_collector
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - start, pool="sync")
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long each checkout waited."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - start, pool="async")
+
 
 engine = create_engine(
     settings.DATABASE_URL,
-    pool_pre_ping=True
+    pool_pre_ping=True,
+    poolclass=TimedQueuePool
 )
 
 SessionLocal = sessionmaker(
@@ -13,9 +42,53 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+
+def async_database_url(url: str) -> str:
+    """
+    Map a sync DATABASE_URL onto its asyncio driver
+    (psycopg2 -> asyncpg, pysqlite -> aiosqlite).
+    """
+    scheme, sep, rest = url.partition("://")
+    dialect = scheme.split("+")[0]
+    drivers = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+    if dialect not in drivers:
+        return url
+    return f"{dialect}+{drivers[dialect]}{sep}{rest}"
+
+
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL),
+    pool_pre_ping=True,
+    poolclass=TimedAsyncQueuePool
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    autoflush=False,
+    expire_on_commit=False,
+    bind=async_engine
+)
+
+
+def _pool_gauges():
+    lines = [
+        "# HELP db_pool_checked_out Connections currently checked out.",
+        "# TYPE db_pool_checked_out gauge",
+    ]
+    for name, pool in (("sync", engine.pool), ("async", async_engine.pool)):
+        lines.append(f'db_pool_checked_out{{pool="{name}"}} {pool.checkedout()}')
+    return lines
+
+
+register_collector(_pool_gauges)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
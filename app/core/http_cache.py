@@ -0,0 +1,206 @@
+import gzip
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.responses import ORJSONResponse, dumps
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Smaller bodies are sent as-is (compression would barely help or grow them)
+COMPRESS_MIN_BYTES = 512
+
+# Larger bodies are neither compressed nor kept in the cache
+CACHE_MAX_BODY_BYTES = 256 * 1024
+
+# Compression runs on the request path (once per cached URL), so use fast
+# levels rather than the maxima
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Changes whenever scripture or commentary is re-ingested or re-enriched;
+# counts and sums are cheap and move with every load/enrichment run. They
+# do not see text edited in place, so bump CONTENT_VERSION after that.
+STAMP_SQL = text("""
+    SELECT
+        (SELECT count(*) FROM bible_verses),
+        (SELECT coalesce(max(id), 0) FROM bible_verses),
+        (SELECT count(*) FROM commentary_docs),
+        (SELECT coalesce(max(id), 0) FROM commentary_docs),
+        (SELECT count(book) FROM commentary_docs),
+        (SELECT coalesce(sum(chapter), 0) FROM commentary_docs)
+""")
+
+# Tables/columns added by optional setup steps; each counts toward the
+# stamp when present
+OPTIONAL_STAMP_SQL = [
+    # verse alignment (enrich_adam_clarke_metadata.py)
+    text("SELECT count(verse_span) FROM commentary_docs"),
+    # precomputed neighbours (build_similar_verses.py)
+    text("""
+        SELECT count(*), coalesce(sum(similar_id), 0), coalesce(sum(rank * score), 0)
+        FROM bible_verse_similar
+    """),
+]
+
+_stamp: str | None = None
+
+
+def content_stamp() -> str | None:
+    """
+    Version stamp of the scripture/commentary content, or None if it could
+    not be computed (caching is then disabled).
+    """
+    return _stamp
+
+
+def load_content_stamp() -> None:
+    global _stamp
+    db = SessionLocal()
+    try:
+        values = list(db.execute(STAMP_SQL).one())
+        for sql in OPTIONAL_STAMP_SQL:
+            try:
+                values.extend(db.execute(sql).one())
+            except SQLAlchemyError:
+                db.rollback()
+                values.append("-")
+    except SQLAlchemyError as exc:
+        logger.warning("HTTP cache disabled: %s", exc.__class__.__name__)
+        return
+    finally:
+        db.close()
+
+    source = "|".join(str(value) for value in values) + "|" + settings.CONTENT_VERSION
+    _stamp = hashlib.sha1(source.encode()).hexdigest()[:16]
+
+
+class EncodedPayload:
+    """
+    One serialized response body, with its compressed variants.
+    """
+
+    __slots__ = ("identity", "gzip", "br")
+
+    def __init__(self, body: bytes):
+        self.identity = body
+        self.gzip = self.br = None
+        if COMPRESS_MIN_BYTES <= len(body) <= CACHE_MAX_BODY_BYTES:
+            self.gzip = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+            if brotli is not None:
+                self.br = brotli.compress(body, quality=BROTLI_QUALITY)
+
+    def select(self, accept_encoding: str) -> tuple[bytes, str | None]:
+        accepted = {
+            part.split(";")[0].strip().lower()
+            for part in accept_encoding.split(",")
+        }
+        if self.br is not None and "br" in accepted:
+            return self.br, "br"
+        if self.gzip is not None and "gzip" in accepted:
+            return self.gzip, "gzip"
+        return self.identity, None
+
+
+class ResponseCache:
+    """
+    LRU of encoded payloads keyed by path + query, for content that only
+    changes between ingestions.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, EncodedPayload] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> EncodedPayload | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple, entry: EncodedPayload) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_cache = ResponseCache(settings.HTTP_CACHE_MAX_ENTRIES)
+
+
+def _etag(stamp: str) -> str:
+    # Weak: the same content is served in several encodings
+    return f'W/"{stamp}"'
+
+
+def _matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in candidates or etag[2:] in candidates
+
+
+def cached_json(request: Request, build, store: bool = True):
+    """
+    Serve the JSON payload returned by `build()` with an ETag and
+    Cache-Control, as 304 when the client already has it, and from
+    pre-compressed bytes cached per URL.
+
+    Pass `store=False` for payloads whose size the client controls (e.g.
+    many references at once): they still get the ETag and 304s, but are
+    built per request and neither compressed nor kept. Bodies over
+    CACHE_MAX_BODY_BYTES are never kept.
+
+    `build` may return None for a response that must not be cached; this
+    then returns None too and the caller responds some other way. Without
+    a content stamp the payload is sent uncached.
+    """
+    stamp = content_stamp()
+    if stamp is None:
+        payload = build()
+        return None if payload is None else ORJSONResponse(payload)
+
+    etag = _etag(stamp)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.HTTP_CACHE_MAX_AGE_SECONDS}",
+        "Vary": "Accept-Encoding",
+    }
+
+    # Only cacheable responses carry this ETag, so a match needs no lookup
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if not store:
+        payload = build()
+        return None if payload is None else ORJSONResponse(payload, headers=headers)
+
+    key = (stamp, request.url.path, tuple(sorted(request.query_params.multi_items())))
+    entry = _cache.get(key)
+    if entry is None:
+        payload = build()
+        if payload is None:
+            return None
+        entry = EncodedPayload(dumps(payload))
+        if len(entry.identity) <= CACHE_MAX_BODY_BYTES:
+            _cache.put(key, entry)
+
+    body, encoding = entry.select(request.headers.get("accept-encoding", ""))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
@@ -0,0 +1,23 @@
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON rendered with orjson (several times faster than the stdlib, and
+    encodes datetimes and numpy values natively).
+
+    It is the app's default response class. Hot endpoints also return it
+    directly: FastAPI passes a Response through untouched, skipping the
+    jsonable_encoder walk over every row.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(
+        content,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    )
@@ -1,9 +1,34 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api import verses, commentary, ai, health, metadata, notes
+from app.api import verses, commentary, ai, health, metadata, notes, metrics, search
+from app.core.http_cache import load_content_stamp
+from app.core.metrics import MetricsMiddleware
+from app.core.responses import ORJSONResponse
+from app.services.corpus import check_verse_ordinals, load_configured_corpus
+from app.services.vector_index import load_configured_vector_index
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Reference lookups select by ordinal/range: refuse to serve rows they
+    # would silently miss
+    check_verse_ordinals()
+    notes.check_note_ranges()
+    # Scripture text is immutable; load it once so reads skip the DB pool
+    load_configured_corpus()
+    load_configured_vector_index()
+    load_content_stamp()
+    yield
 
-app = FastAPI(title="Bible Study API")
+
+app = FastAPI(
+    title="Bible Study API",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
 
 # ✅ CORS (required for Safari + Vite)
 app.add_middleware(
@@ -14,9 +39,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(health.router, tags=["health"])
+app.include_router(metrics.router, tags=["metrics"])
 app.include_router(verses.router, tags=["verses"])
 app.include_router(commentary.router, tags=["commentary"])
 app.include_router(metadata.router, tags=["metadata"])
 app.include_router(notes.router, tags=["notes"])
+app.include_router(search.router, tags=["search"])
 app.include_router(ai.router, tags=["ai"])
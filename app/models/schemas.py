@@ -5,6 +5,8 @@ class StudyRequest(BaseModel):
     book: str | None = None
     chapter: int | None = None
     verse: int | None = None
+    # Adds per-stage timings (ms) to the response meta
+    include_timings: bool = False
 
 
 class NoteCreate(BaseModel):
@@ -19,3 +21,15 @@ class NoteUpdate(BaseModel):
     content: str | None = None
     tags: str | None = None
     verse_ref: str | None = None
+
+
+class SearchRequest(BaseModel):
+    queries: list[str]
+    # "verses" and/or "commentary"
+    targets: list[str] = ["verses", "commentary"]
+    book: str | None = None
+    chapter: int | None = None
+    # "OT" or "NT"
+    testament: str | None = None
+    limit: int = 10
+    offset: int = 0
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+from app.services.llm import MODEL_NAME, OPTIONS, SYSTEM_PROMPT
+
+# Hits whose used_at is written in one statement (reads never write alone)
+TOUCH_BATCH = 128
+
+
+def answer_key(prompt: str) -> str:
+    """
+    Content-addressed key for a generation: the final prompt plus everything
+    else that shapes the answer (model, system prompt, sampling options).
+    """
+    payload = json.dumps(
+        {
+            "model": MODEL_NAME,
+            "options": OPTIONS,
+            "system": SYSTEM_PROMPT,
+            "prompt": prompt,
+        },
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryAnswerCache:
+    """
+    Per-process LRU of answers with a TTL.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, answer = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return answer
+
+    def set(self, key: str, answer: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class FileAnswerCache:
+    """
+    SQLite-backed answer cache, shared by every uvicorn worker that points
+    at the same file.
+
+    Lookups are read-only: hits are remembered and their `used_at` written
+    in batches (with the next `set`, or every TOUCH_BATCH hits), so LRU
+    order lags slightly behind reads.
+    """
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._touched: dict[str, float] = {}
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                answer TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT answer FROM answers WHERE key = ? AND expires_at >= ?",
+                (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= TOUCH_BATCH:
+                self._flush_touched()
+                self._db.commit()
+            return row[0]
+
+    def _flush_touched(self) -> None:
+        if self._touched:
+            self._db.executemany(
+                "UPDATE answers SET used_at = max(used_at, ?) WHERE key = ?",
+                [(used_at, key) for key, used_at in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def set(self, key: str, answer: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (key, answer, expires_at, used_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, answer, now + self.ttl, now)
+            )
+            self._flush_touched()
+            # Evict expired entries, then least recently used beyond the cap
+            self._db.execute("DELETE FROM answers WHERE expires_at < ?", (now,))
+            self._db.execute("""
+                DELETE FROM answers
+                WHERE key IN (
+                    SELECT key FROM answers
+                    ORDER BY used_at DESC
+                    LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            self._db.commit()
+
+
+_cache = None
+
+
+def get_answer_cache():
+    """
+    Return the configured answer cache backend, or None when disabled
+    (ANSWER_CACHE_BACKEND = "none").
+    """
+    global _cache
+    if _cache is None:
+        backend = settings.ANSWER_CACHE_BACKEND
+        if backend == "memory":
+            _cache = MemoryAnswerCache(
+                settings.ANSWER_CACHE_MAX_ENTRIES,
+                settings.ANSWER_CACHE_TTL_SECONDS
+            )
+        elif backend == "file":
+            _cache = FileAnswerCache(
+                settings.ANSWER_CACHE_PATH,
+                settings.ANSWER_CACHE_MAX_ENTRIES,
+                settings.ANSWER_CACHE_TTL_SECONDS
+            )
+        elif backend != "none":
+            raise ValueError(f"Unknown ANSWER_CACHE_BACKEND: {backend}")
+    return _cache
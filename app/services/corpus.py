@@ -0,0 +1,265 @@
+import logging
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, ProgrammingError, SQLAlchemyError
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.references import ScriptureRange, book_index, resolve_book
+
+logger = logging.getLogger(__name__)
+
+VerseRow = namedtuple("VerseRow", ["id", "book", "chapter", "verse", "text"])
+
+
+class CorpusVersion:
+    """
+    Read-only, array-backed copy of one version of `bible_verses`.
+
+    Verses are stored in (book, chapter, verse) order in parallel arrays;
+    each chapter maps to a [start, end) slice of those arrays.
+    """
+
+    def __init__(self, version: str, rows):
+        self.version = version
+        self._ids = array("l")
+        self._verses = array("H")
+        self._text_offsets = array("L", [0])
+        self._chapters: dict[str, dict[int, tuple[int, int]]] = {}
+
+        texts = []
+        length = 0
+        current = None
+        start = 0
+
+        for index, (verse_id, book, chapter, verse, verse_text) in enumerate(rows):
+            if (book, chapter) != current:
+                if current is not None:
+                    self._chapters[current[0]][current[1]] = (start, index)
+                current = (book, chapter)
+                start = index
+                self._chapters.setdefault(book, {})
+
+            verse_text = verse_text or ""
+            self._ids.append(verse_id)
+            self._verses.append(verse)
+            texts.append(verse_text)
+            length += len(verse_text)
+            self._text_offsets.append(length)
+
+        if current is not None:
+            self._chapters[current[0]][current[1]] = (start, len(self._ids))
+
+        self._text = "".join(texts)
+        self._canonical = {
+            resolve_book(name): name
+            for name in self._chapters
+        }
+
+    def __len__(self):
+        return len(self._ids)
+
+    def books(self) -> list[str]:
+        return list(self._chapters)
+
+    def book_name(self, book: str) -> str:
+        """
+        The stored spelling of `book`, which may be given as any accepted
+        name or abbreviation ("Ps", "Psalm", "Psalms").
+        """
+        if book in self._chapters:
+            return book
+        return self._canonical.get(resolve_book(book), book)
+
+    def chapters(self, book: str) -> list[int]:
+        return sorted(self._chapters.get(self.book_name(book), {}))
+
+    def _span(self, book: str, chapter: int, verse: int | None = None):
+        span = self._chapters.get(book, {}).get(chapter)
+        if span is None:
+            return 0, 0
+
+        start, end = span
+        if verse:
+            first = bisect_left(self._verses, verse, start, end)
+            last = bisect_right(self._verses, verse, start, end)
+            return first, last
+        return start, end
+
+    def verse_numbers(self, book: str, chapter: int) -> list[int]:
+        start, end = self._span(self.book_name(book), chapter)
+        return list(dict.fromkeys(self._verses[start:end]))
+
+    def _rows(self, book: str, chapter: int, start: int, end: int) -> list[VerseRow]:
+        offsets = self._text_offsets
+        return [
+            VerseRow(
+                self._ids[i],
+                book,
+                chapter,
+                self._verses[i],
+                self._text[offsets[i]:offsets[i + 1]]
+            )
+            for i in range(start, end)
+        ]
+
+    def verses(
+        self,
+        book: str,
+        chapter: int,
+        verse: int | None = None
+    ) -> list[VerseRow]:
+        book = self.book_name(book)
+        start, end = self._span(book, chapter, verse)
+        return self._rows(book, chapter, start, end)
+
+    def passage(self, passage: ScriptureRange) -> list[VerseRow]:
+        """
+        Every verse in `passage`, in order, across chapter boundaries.
+        """
+        book = self.book_name(passage.book)
+        chapters = self._chapters.get(book, {})
+        rows = []
+
+        for chapter in range(passage.start_chapter, passage.end_chapter + 1):
+            span = chapters.get(chapter)
+            if span is None:
+                continue
+
+            start, end = span
+            if chapter == passage.start_chapter and passage.start_verse:
+                start = bisect_left(self._verses, passage.start_verse, start, end)
+            if chapter == passage.end_chapter and passage.end_verse is not None:
+                end = bisect_right(self._verses, passage.end_verse, start, end)
+            rows.extend(self._rows(book, chapter, start, end))
+
+        return rows
+
+
+_versions: dict[str, CorpusVersion] = {}
+
+# version -> {stored or canonical name: stored name}, for the SQL paths
+_stored_books: dict[str, dict[str, str]] = {}
+
+
+def load_corpus(db, versions: list[str]) -> None:
+    """
+    Load the given versions of `bible_verses` into memory.
+    Intended to run once at startup; the text is immutable between ingestions.
+    """
+    sql = text("""
+        SELECT id, book, chapter, verse, text
+        FROM bible_verses
+        WHERE version_code = :version
+        ORDER BY book, chapter, verse
+    """)
+
+    for version in versions:
+        rows = db.execute(sql, {"version": version})
+        corpus = CorpusVersion(version, rows)
+        if len(corpus):
+            _versions[version] = corpus
+            logger.info("Loaded %s verses for %s into memory", len(corpus), version)
+
+
+def get_corpus(version: str) -> CorpusVersion | None:
+    """
+    Return the in-memory corpus for `version`, or None if it isn't loaded
+    (callers fall back to SQL).
+    """
+    return _versions.get(version)
+
+
+def stored_book_name(db, book: str, version: str) -> str:
+    """
+    SQL-path counterpart of CorpusVersion.book_name: the spelling of `book`
+    stored for `version`, given any accepted name or abbreviation. The
+    version's book names are read once and kept (they change only with a
+    data load, which restarts the API).
+    """
+    names = _stored_books.get(version)
+    if names is None:
+        rows = db.execute(
+            text("SELECT DISTINCT book FROM bible_verses WHERE version_code = :version"),
+            {"version": version}
+        ).fetchall()
+        names = {
+            resolve_book(r.book): r.book
+            for r in rows
+            if resolve_book(r.book) is not None
+        }
+        names.update({r.book: r.book for r in rows})
+        if rows:
+            _stored_books[version] = names
+
+    return names.get(book) or names.get(resolve_book(book)) or book
+
+
+def load_configured_corpus() -> None:
+    """
+    Load the versions listed in settings.CORPUS_VERSIONS. A database that is
+    unreachable at startup is not fatal: endpoints keep using SQL.
+    """
+    versions = [
+        v.strip()
+        for v in settings.CORPUS_VERSIONS.split(",")
+        if v.strip()
+    ]
+    if not versions:
+        return
+
+    db = SessionLocal()
+    try:
+        load_corpus(db, versions)
+    except SQLAlchemyError as exc:
+        logger.warning("Corpus preload skipped: %s", exc.__class__.__name__)
+    finally:
+        db.close()
+
+
+def check_verse_ordinals() -> None:
+    """
+    Refuse to start while verses of known books have no ordinal: passage,
+    parallel and reference lookups select by ordinal and would silently
+    skip them. Books the ordinal table doesn't know are only logged (no
+    reference can name them). An unreachable database is not fatal;
+    a missing ordinal column is.
+    """
+    db = SessionLocal()
+    try:
+        rows = db.execute(text("""
+            SELECT book, count(*) AS missing
+            FROM bible_verses
+            WHERE ordinal IS NULL
+            GROUP BY book
+        """)).fetchall()
+    except OperationalError as exc:
+        # Unreachable database: endpoints will report it per request
+        logger.warning("Verse ordinal check skipped: %s", exc.__class__.__name__)
+        return
+    except ProgrammingError as exc:
+        # Undefined table or column: every lookup that needs it would fail
+        raise RuntimeError(
+            "bible_verses.ordinal is missing "
+            f"({exc.orig.__class__.__name__}); add it as in the README's "
+            "Database Tables section and run scripts/backfill_verse_ordinals.py"
+        ) from exc
+    finally:
+        db.close()
+
+    known = [(r.book, r.missing) for r in rows if book_index(r.book) is not None]
+    unknown = [r.book for r in rows if book_index(r.book) is None]
+    if unknown:
+        logger.warning(
+            "bible_verses books without ordinals (not addressable by reference): %s",
+            ", ".join(sorted(unknown))
+        )
+    if known:
+        raise RuntimeError(
+            f"{sum(missing for _, missing in known)} bible_verses rows "
+            f"({', '.join(sorted(book for book, _ in known))}) have no ordinal; "
+            "run scripts/backfill_verse_ordinals.py"
+        )
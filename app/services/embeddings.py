@@ -1,21 +1,354 @@
-from sentence_transformers import SentenceTransformer
+import json
+import queue
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import instrument, register_collector
 
 # This MUST match how your DB embeddings were created
 MODEL_NAME = "all-MiniLM-L6-v2"
 
 _model = None
+_model_lock = threading.Lock()
+
+
+class OnnxEncoder:
+    """
+    ONNX Runtime version of the SentenceTransformer encoder: tokenize, run
+    the exported transformer, mean-pool over the attention mask, normalize.
+
+    Loads only onnxruntime and tokenizers (no torch), which keeps worker
+    memory and startup time down.
+    """
+
+    def __init__(self, directory: str | Path, quantized: bool = False):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        directory = Path(directory)
+        with open(directory / "config.json", encoding="utf-8") as f:
+            config = json.load(f)
+
+        self.tokenizer = Tokenizer.from_file(str(directory / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=config.get("pad_token_id", 0))
+
+        filename = "model_quantized.onnx" if quantized else "model.onnx"
+        self.session = onnxruntime.InferenceSession(
+            str(directory / filename),
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=True, **kwargs):
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(list(texts[start:start + batch_size]))
+            inputs = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            hidden = self.session.run(
+                None,
+                {name: value for name, value in inputs.items() if name in self.input_names}
+            )[0]
+
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            batches.append(pooled)
+
+        vectors = np.vstack(batches).astype(np.float32)
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.clip(norms, 1e-12, None)
+        return vectors
+
+
+def backend_name() -> str:
+    """
+    Part of the embedding cache key, so vectors from different backends or
+    quantization levels are never mixed.
+    """
+    if settings.EMBEDDING_BACKEND == "onnx":
+        return "onnx-int8" if settings.EMBEDDING_ONNX_QUANTIZED else "onnx"
+    return "torch"
+
+
+def load_model(backend: str | None = None):
+    backend = backend or settings.EMBEDDING_BACKEND
+    if backend == "onnx":
+        return OnnxEncoder(
+            settings.EMBEDDING_ONNX_DIR,
+            quantized=settings.EMBEDDING_ONNX_QUANTIZED
+        )
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(MODEL_NAME)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
+
 
 def get_model():
     global _model
     if _model is None:
-        _model = SentenceTransformer(MODEL_NAME)
+        with _model_lock:
+            if _model is None:
+                _model = load_model()
     return _model
 
 
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding requests into one `model.encode()` call.
+
+    Callers (usually threadpool workers) enqueue texts and block on futures;
+    a single background thread collects up to `max_batch_size` texts, waiting
+    at most `max_wait_ms` after the first one arrives, and encodes them in
+    one forward pass.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait_ms: float):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: queue.Queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, texts: list[str]) -> list[Future]:
+        self._ensure_worker()
+        futures = []
+        for text in texts:
+            future = Future()
+            self._queue.put((text, future))
+            futures.append(future)
+        return futures
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run,
+                    name="embedding-batcher",
+                    daemon=True
+                )
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for text, _ in batch]
+
+            try:
+                vectors = get_model().encode(
+                    texts,
+                    batch_size=len(texts),
+                    normalize_embeddings=True
+                )
+            except Exception as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector.tolist())
+
+
+CACHE_MODEL_KEY = f"{MODEL_NAME}:{backend_name()}"
+
+
+def normalize_query(text: str) -> str:
+    """
+    Cache key form of a query. MiniLM-L6 is uncased and ignores whitespace
+    runs, so case and indentation differences embed identically.
+    """
+    return " ".join(text.split()).lower()
+
+
+class EmbeddingCache:
+    """
+    Embedding cache keyed by model name + normalized text.
+
+    The first tier is a bounded in-memory LRU; the optional second tier is a
+    SQLite file of float32 vectors that survives restarts and can be shared
+    by several workers.
+    """
+
+    def __init__(self, max_entries: int, path: str | None = None):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (model, text)
+                )
+            """)
+            self._db.commit()
+
+    def get(self, model: str, text: str) -> list[float] | None:
+        key = (model, text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector FROM embeddings WHERE model = ? AND text = ?",
+                    key
+                ).fetchone()
+                if row is not None:
+                    vector = array("f", row[0]).tolist()
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector
+
+            self.misses += 1
+            return None
+
+    def put(self, model: str, text: str, vector: list[float]) -> None:
+        key = (model, text)
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (model, text, vector) "
+                    "VALUES (?, ?, ?)",
+                    (model, text, array("f", vector).tobytes())
+                )
+                self._db.commit()
+
+    def _remember(self, key, vector):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "persistent": self._db is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+_cache = EmbeddingCache(
+    max_entries=settings.EMBEDDING_CACHE_SIZE,
+    path=settings.EMBEDDING_CACHE_PATH
+)
+
+_batcher = EmbeddingBatcher(
+    max_batch_size=settings.EMBEDDING_BATCH_SIZE,
+    max_wait_ms=settings.EMBEDDING_BATCH_WAIT_MS
+)
+
+
 def embed(text: str) -> list[float]:
     """
     Generate a 384-dim embedding using MiniLM-L6.
     """
-    model = get_model()
-    embedding = model.encode(text, normalize_embeddings=True)
-    return embedding.tolist()
+    return embed_many([text])[0]
+
+
+@instrument("embed")
+def embed_many(texts: list[str]) -> list[list[float]]:
+    """
+    Embed several texts in a single model pass. Cached texts skip the model;
+    results are in input order.
+
+    A single missing text goes through the batcher so it can share a pass
+    with concurrent callers; several are already a batch and are encoded
+    together directly (the batcher would split them at
+    EMBEDDING_BATCH_SIZE).
+    """
+    keys = [normalize_query(text) for text in texts]
+    vectors = {}
+    missing = {}
+
+    for key, text in zip(keys, texts):
+        if key in vectors or key in missing:
+            continue
+        vector = _cache.get(CACHE_MODEL_KEY, key)
+        if vector is None:
+            missing[key] = text
+        else:
+            vectors[key] = vector
+
+    if len(missing) == 1:
+        key, text = next(iter(missing.items()))
+        vectors[key] = _batcher.submit([text])[0].result()
+        _cache.put(CACHE_MODEL_KEY, key, vectors[key])
+    elif missing:
+        encoded = get_model().encode(
+            list(missing.values()),
+            batch_size=len(missing),
+            normalize_embeddings=True
+        )
+        for key, vector in zip(missing, encoded):
+            vectors[key] = vector.tolist()
+            _cache.put(CACHE_MODEL_KEY, key, vectors[key])
+
+    return [vectors[key] for key in keys]
+
+
+def embedding_cache_stats() -> dict:
+    return _cache.stats()
+
+
+def _cache_counters():
+    stats = _cache.stats()
+    lines = [
+        "# HELP embedding_cache_lookups_total Embedding cache lookups by result.",
+        "# TYPE embedding_cache_lookups_total counter",
+    ]
+    for result in ("hits", "disk_hits", "misses"):
+        lines.append(
+            f'embedding_cache_lookups_total{{result="{result}"}} {stats[result]}'
+        )
+    return lines
+
+
+register_collector(_cache_counters)
@@ -1,28 +1,276 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
 import ollama
 
+from app.core.config import settings
+from app.core.metrics import Counter, instrument, record_stage, register_collector
+
 MODEL_NAME = "qwen2.5:3b"
 
+SYSTEM_PROMPT = (
+    "You are a conservative Bible study assistant. "
+    "You must not speculate or invent commentary. "
+    "If the source material is weak, say so plainly."
+)
+
+OPTIONS = {
+    "temperature": 0.2,
+    "top_p": 0.9
+}
+
+_async_client = None
+
+
+def build_messages(prompt: str) -> list[dict]:
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+
+def get_async_client():
+    global _async_client
+    if _async_client is None:
+        _async_client = ollama.AsyncClient()
+    return _async_client
+
+
+@instrument("llm")
 def ask_llm(prompt: str) -> str:
     response = ollama.chat(
         model=MODEL_NAME,
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are a conservative Bible study assistant. "
-                    "You must not speculate or invent commentary. "
-                    "If the source material is weak, say so plainly."
-                )
-            },
-            {
-                "role": "user",
-                "content": prompt
-            }
-        ],
-        options={
-            "temperature": 0.2,
-            "top_p": 0.9
+        messages=build_messages(prompt),
+        options=OPTIONS
+    )
+
+    return response["message"]["content"]
+
+
+class LLMBusy(Exception):
+    """
+    The scheduler could not start a generation; maps to an HTTP error with
+    Retry-After.
+    """
+    status_code = 503
+
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class LLMQueueFull(LLMBusy):
+    status_code = 429
+
+
+class LLMQueueTimeout(LLMBusy):
+    status_code = 503
+
+
+LLM_REJECTED = Counter(
+    "llm_rejected_total",
+    "LLM requests rejected by the scheduler, by reason."
+)
+
+
+class LLMScheduler:
+    """
+    Admission control in front of Ollama (one instance per worker process).
+
+    At most `max_concurrency` generations run at once; up to `max_queue`
+    more wait in FIFO order for at most `queue_timeout` seconds. Anything
+    beyond that is rejected immediately, so a burst degrades into fast
+    429s instead of every request slowing down together. Identical prompts
+    already in flight share a single generation.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float, retry_after: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        # prompt -> [task, number of callers awaiting it]
+        self._inflight: dict[str, list] = {}
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for f in self._waiters if not f.done())
+
+    def check_capacity(self) -> None:
+        """
+        Raise LLMQueueFull if a new request would be rejected right now.
+        """
+        if self.active >= self.max_concurrency and self.queued >= self.max_queue:
+            LLM_REJECTED.inc(reason="queue_full")
+            raise LLMQueueFull("LLM busy: queue full", self.retry_after)
+
+    async def _acquire(self) -> None:
+        if self.active < self.max_concurrency and not self.queued:
+            self.active += 1
+            return
+
+        self.check_capacity()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            # The slot is handed over by _release (active is unchanged)
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as exc:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot just as we gave up: pass it on
+                self._release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(exc, asyncio.TimeoutError):
+                LLM_REJECTED.inc(reason="queue_timeout")
+                raise LLMQueueTimeout("LLM busy: timed out waiting", self.retry_after) from None
+            raise
+        finally:
+            record_stage("llm_queue", time.perf_counter() - start)
+
+    def _release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Hold one generation slot (used for streaming, which isn't shared).
+        """
+        await self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _generate(self, generate, prompt: str):
+        async with self.slot():
+            return await generate(prompt)
+
+    async def run(self, generate, prompt: str) -> str:
+        """
+        `await generate(prompt)` under the concurrency limit, sharing the
+        result with concurrent callers of the same prompt. The generation
+        is cancelled only if every caller waiting for it goes away.
+        """
+        entry = self._inflight.get(prompt)
+        if entry is None:
+            task = asyncio.ensure_future(self._generate(generate, prompt))
+            entry = self._inflight[prompt] = [task, 0]
+            task.add_done_callback(lambda _: self._inflight.pop(prompt, None))
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if entry[1] == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            entry[1] -= 1
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "inflight_prompts": len(self._inflight),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
         }
+
+
+_scheduler = LLMScheduler(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    max_queue=settings.LLM_MAX_QUEUE,
+    queue_timeout=settings.LLM_QUEUE_TIMEOUT_SECONDS,
+    retry_after=settings.LLM_RETRY_AFTER_SECONDS
+)
+
+
+def get_scheduler() -> LLMScheduler:
+    return _scheduler
+
+
+def _scheduler_gauges():
+    stats = _scheduler.stats()
+    return [
+        "# HELP llm_active_generations Generations currently running in Ollama.",
+        "# TYPE llm_active_generations gauge",
+        f"llm_active_generations {stats['active']}",
+        "# HELP llm_queued_requests Requests waiting for a generation slot.",
+        "# TYPE llm_queued_requests gauge",
+        f"llm_queued_requests {stats['queued']}",
+    ]
+
+
+register_collector(_scheduler_gauges)
+
+
+async def _chat(prompt: str) -> str:
+    response = await get_async_client().chat(
+        model=MODEL_NAME,
+        messages=build_messages(prompt),
+        options=OPTIONS
     )
 
     return response["message"]["content"]
+
+
+async def _chat_stream(prompt: str):
+    stream = await get_async_client().chat(
+        model=MODEL_NAME,
+        messages=build_messages(prompt),
+        options=OPTIONS,
+        stream=True
+    )
+
+    try:
+        async for part in stream:
+            content = part["message"]["content"]
+            if content:
+                yield content
+    finally:
+        await stream.aclose()
+
+
+@instrument("llm")
+async def ask_llm_async(prompt: str) -> str:
+    """
+    Same as ask_llm, but awaits Ollama over the async client so no
+    threadpool worker is held for the length of the generation. Goes
+    through the scheduler; raises LLMBusy when it is saturated.
+    """
+    return await _scheduler.run(_chat, prompt)
+
+
+async def stream_llm(prompt: str):
+    """
+    Yield answer text as Ollama generates it, holding a scheduler slot for
+    the duration. Closing the generator (e.g. when the client disconnects)
+    closes the HTTP stream, which stops the generation in Ollama.
+    """
+    async with _scheduler.slot():
+        tokens = _chat_stream(prompt)
+        try:
+            async for token in tokens:
+                yield token
+        finally:
+            await tokens.aclose()
@@ -1,21 +1,224 @@
-def build_prompt(
-    question,
+import re
+from collections import namedtuple
+from dataclasses import dataclass, field
+
+from app.core.config import settings
+from app.core.metrics import instrument
+
+MAX_VERSE_COMMENTARY = 8
+MAX_CHAPTER_COMMENTARY = 10
+
+# Share of the budget scripture may use before commentary is packed;
+# whatever commentary leaves unused goes back to scripture.
+VERSE_BUDGET_SHARE = 0.4
+
+# Word-trigram containment above which two commentary chunks count as the
+# same text (the scraped Clarke pages repeat paragraphs verbatim or nearly)
+DUPLICATE_THRESHOLD = 0.8
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Smallest excerpt worth sending when the top commentary chunk is cut to fit
+MIN_EXCERPT_TOKENS = 32
+
+# A commentary chunk shortened to fit the budget (score keeps its rank)
+CommentaryExcerpt = namedtuple("CommentaryExcerpt", ["content", "score"])
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for English prose (~4 characters per token); close
+    enough for budgeting without loading the model's tokenizer.
+    """
+    return (len(text) + 3) // 4
+
+
+def _shingles(text: str) -> set[int]:
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < 3:
+        return {hash(" ".join(words))}
+    return {hash((a, b, c)) for a, b, c in zip(words, words[1:], words[2:])}
+
+
+def _is_duplicate(shingles: set[int], kept: list[set[int]]) -> bool:
+    for other in kept:
+        overlap = len(shingles & other)
+        if overlap and overlap / min(len(shingles), len(other)) >= DUPLICATE_THRESHOLD:
+            return True
+    return False
+
+
+def _by_score(rows):
+    # Rows without a score (direct lookups) keep their retrieval order
+    return sorted(
+        rows,
+        key=lambda row: -(getattr(row, "score", None) or 0.0)
+    )
+
+
+@dataclass
+class PackedContext:
+    verse_commentary: list = field(default_factory=list)
+    chapter_commentary: list = field(default_factory=list)
+    verses: list = field(default_factory=list)
+    tokens: int = 0
+    budget: int = 0
+    dropped: dict = field(default_factory=dict)
+
+    def meta(self) -> dict:
+        return {
+            "tokens": self.tokens,
+            "budget": self.budget,
+            "dropped": self.dropped
+        }
+
+
+def _truncate(text: str, tokens: int) -> str:
+    """
+    Cut `text` at a word boundary so it estimates to at most `tokens`.
+    """
+    limit = tokens * 4 - 1
+    if len(text) <= limit:
+        return text
+    # Drop the word the limit splits (unless it is the only one)
+    cut = text[:limit + 1].rsplit(None, 1)[0] if text[limit].strip() else text[:limit]
+    return cut.rstrip() + "…"
+
+
+def _verse_line(row) -> str:
+    return f"{row.book} {row.chapter}:{row.verse} — {row.text}"
+
+
+def _verse_priority(verses, focus: tuple[int, int] | None):
+    """
+    Order in which verses are kept when scripture doesn't fit: nearest to
+    the focus verse, else best score, else canonical order.
+    """
+    if focus is not None:
+        chapter, verse = focus
+        return sorted(
+            range(len(verses)),
+            key=lambda i: (
+                abs(verses[i].chapter - chapter),
+                abs((verses[i].verse or 0) - verse)
+            )
+        )
+    order = range(len(verses))
+    if any(getattr(row, "score", None) is not None for row in verses):
+        return sorted(order, key=lambda i: -(getattr(verses[i], "score", None) or 0.0))
+    return list(order)
+
+
+def _pack_verses(verses, priority, kept: set[int], budget: int) -> int:
+    used = 0
+    for i in priority:
+        if i in kept:
+            continue
+        cost = estimate_tokens(_verse_line(verses[i])) + 1
+        if used + cost > budget:
+            continue
+        kept.add(i)
+        used += cost
+    return used
+
+
+@instrument("pack_context")
+def pack_context(
+    question: str,
     verse_commentary,
     chapter_commentary,
-    verses
-):
-    verse_commentary_texts = [c.content.strip() for c in verse_commentary if c.content]
-    chapter_commentary_texts = [c.content.strip() for c in chapter_commentary if c.content]
-
-    verses_block = "\n".join(
-        f"{v.book} {v.chapter}:{v.verse} — {v.text}"
-        for v in verses
+    verses,
+    focus: tuple[int, int] | None = None,
+    budget: int | None = None
+) -> PackedContext:
+    """
+    Fit retrieved material into the prompt token budget: drop near-duplicate
+    commentary chunks, keep the best-scoring chunks that fit, and cap the
+    scripture block (keeping the verses nearest `focus`, a (chapter, verse)
+    pair). When no commentary chunk fits whole, the best one is cut to the
+    remaining budget. Counts of everything left out are in `dropped`.
+    """
+    budget = budget or settings.PROMPT_TOKEN_BUDGET
+    question_tokens = estimate_tokens(question)
+    available = max(0, budget - question_tokens)
+    packed = PackedContext(budget=budget)
+
+    # Scripture first, up to its share
+    priority = _verse_priority(verses, focus)
+    kept_verses: set[int] = set()
+    verse_tokens = _pack_verses(
+        verses, priority, kept_verses, int(available * VERSE_BUDGET_SHARE)
     )
 
+    # Commentary: verse-level if any, else chapter-level
+    if verse_commentary:
+        candidates, limit, target = verse_commentary, MAX_VERSE_COMMENTARY, packed.verse_commentary
+    else:
+        candidates, limit, target = chapter_commentary, MAX_CHAPTER_COMMENTARY, packed.chapter_commentary
+
+    remaining = available - verse_tokens
+    commentary_tokens = 0
+    duplicates = over_budget = truncated = 0
+    kept_shingles: list[set[int]] = []
+    ranked = _by_score(c for c in candidates if c.content and c.content.strip())
+    for row in ranked:
+        if len(target) >= limit:
+            over_budget += 1
+            continue
+
+        content = row.content.strip()
+        shingles = _shingles(content)
+        if _is_duplicate(shingles, kept_shingles):
+            duplicates += 1
+            continue
+
+        cost = estimate_tokens(content) + 1
+        if commentary_tokens + cost > remaining:
+            over_budget += 1
+            continue
+
+        target.append(row)
+        kept_shingles.append(shingles)
+        commentary_tokens += cost
+
+    # Every chunk was too long: an excerpt of the best beats no commentary
+    if not target and ranked and remaining - 1 >= MIN_EXCERPT_TOKENS:
+        excerpt = _truncate(ranked[0].content.strip(), remaining - 1)
+        target.append(CommentaryExcerpt(excerpt, getattr(ranked[0], "score", None)))
+        commentary_tokens = estimate_tokens(excerpt) + 1
+        over_budget -= 1
+        truncated = 1
+
+    # Give scripture whatever commentary didn't use
+    verse_tokens += _pack_verses(
+        verses,
+        priority,
+        kept_verses,
+        available - verse_tokens - commentary_tokens
+    )
+
+    packed.verses = [row for i, row in enumerate(verses) if i in kept_verses]
+    packed.tokens = question_tokens + verse_tokens + commentary_tokens
+    packed.dropped = {
+        "duplicate_commentary": duplicates,
+        "commentary_over_budget": over_budget,
+        "truncated_commentary": truncated,
+        "verses_over_budget": len(verses) - len(kept_verses)
+    }
+    return packed
+
+
+@instrument("build_prompt")
+def build_prompt(question, context: PackedContext):
+    verse_commentary_texts = [c.content.strip() for c in context.verse_commentary]
+    chapter_commentary_texts = [c.content.strip() for c in context.chapter_commentary]
+
+    verses_block = "\n".join(_verse_line(v) for v in context.verses)
+
     if verse_commentary_texts:
         commentary_section = (
             "Adam Clarke Commentary (Verse-level):\n"
-            + "\n\n".join(verse_commentary_texts[:8])
+            + "\n\n".join(verse_commentary_texts)
         )
         confidence = "strong"
     elif chapter_commentary_texts:
@@ -23,9 +226,16 @@ def build_prompt(
             "Adam Clarke Commentary (Chapter-level context):\n"
             "NOTE: Clarke does not comment directly on this verse. "
             "The following reflects his teaching on the chapter as a whole.\n\n"
-            + "\n\n".join(chapter_commentary_texts[:10])
+            + "\n\n".join(chapter_commentary_texts)
         )
         confidence = "moderate"
+    elif context.dropped.get("commentary_over_budget"):
+        commentary_section = (
+            "Adam Clarke commentary was retrieved for this passage but did not "
+            "fit in the prompt; answer from Scripture and say the commentary "
+            "could not be included."
+        )
+        confidence = "weak"
     else:
         commentary_section = (
             "No Adam Clarke commentary was retrieved for this verse or chapter."
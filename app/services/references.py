@@ -0,0 +1,394 @@
+"""
+Scripture reference parsing and canonical verse ordinals.
+
+A verse ordinal is `book_index * 1_000_000 + chapter * 1_000 + verse`, with
+1-based canonical book indexes (Genesis = 1, Revelation = 66). Ordinals sort
+in canonical order, so any passage is a contiguous integer range and
+`bible_verses.ordinal` lookups are index range scans. Whole chapters use
+verse 0 and 999 as their bounds.
+"""
+import re
+from dataclasses import dataclass
+
+CANONICAL_BOOKS = [
+    "Genesis",
+    "Exodus",
+    "Leviticus",
+    "Numbers",
+    "Deuteronomy",
+    "Joshua",
+    "Judges",
+    "Ruth",
+    "1 Samuel",
+    "2 Samuel",
+    "1 Kings",
+    "2 Kings",
+    "1 Chronicles",
+    "2 Chronicles",
+    "Ezra",
+    "Nehemiah",
+    "Esther",
+    "Job",
+    "Psalms",
+    "Proverbs",
+    "Ecclesiastes",
+    "Song of Solomon",
+    "Isaiah",
+    "Jeremiah",
+    "Lamentations",
+    "Ezekiel",
+    "Daniel",
+    "Hosea",
+    "Joel",
+    "Amos",
+    "Obadiah",
+    "Jonah",
+    "Micah",
+    "Nahum",
+    "Habakkuk",
+    "Zephaniah",
+    "Haggai",
+    "Zechariah",
+    "Malachi",
+    "Matthew",
+    "Mark",
+    "Luke",
+    "John",
+    "Acts",
+    "Romans",
+    "1 Corinthians",
+    "2 Corinthians",
+    "Galatians",
+    "Ephesians",
+    "Philippians",
+    "Colossians",
+    "1 Thessalonians",
+    "2 Thessalonians",
+    "1 Timothy",
+    "2 Timothy",
+    "Titus",
+    "Philemon",
+    "Hebrews",
+    "James",
+    "1 Peter",
+    "2 Peter",
+    "1 John",
+    "2 John",
+    "3 John",
+    "Jude",
+    "Revelation",
+]
+
+OLD_TESTAMENT_BOOKS = CANONICAL_BOOKS[:39]
+NEW_TESTAMENT_BOOKS = CANONICAL_BOOKS[39:]
+
+BOOK_ALIASES = {
+    "psalm": "psalms",
+    "song of songs": "song of solomon",
+    "canticles": "song of solomon",
+    "revelations": "revelation",
+}
+
+# Common abbreviations. Numbered books are keyed by their base name
+# ("Samuel" covers "1 Sam", "2 Sam"). Two-letter forms that are also English
+# words ("is", "am", "so") are left out so prose isn't read as a reference.
+ABBREVIATIONS = {
+    "Genesis": ["gen", "gn"],
+    "Exodus": ["exod", "exo", "ex"],
+    "Leviticus": ["lev", "lv"],
+    "Numbers": ["num", "nm", "nb"],
+    "Deuteronomy": ["deut", "deu", "dt"],
+    "Joshua": ["josh", "jos", "jsh"],
+    "Judges": ["judg", "jdg", "jdgs", "jg"],
+    "Ruth": ["rth"],
+    "Samuel": ["sam", "sm"],
+    "Kings": ["kgs", "kin"],
+    "Chronicles": ["chron", "chr"],
+    "Ezra": ["ezr"],
+    "Nehemiah": ["neh"],
+    "Esther": ["esth", "est"],
+    "Job": ["jb"],
+    "Psalms": ["psa", "psm", "pss", "ps"],
+    "Proverbs": ["prov", "prv"],
+    "Ecclesiastes": ["eccles", "eccl", "ecc", "qoh"],
+    "Song of Solomon": ["song", "sos", "cant"],
+    "Isaiah": ["isa"],
+    "Jeremiah": ["jer", "jr"],
+    "Lamentations": ["lam"],
+    "Ezekiel": ["ezek", "eze", "ezk"],
+    "Daniel": ["dan", "dn"],
+    "Hosea": ["hos"],
+    "Joel": ["jl"],
+    "Amos": [],
+    "Obadiah": ["obad", "oba"],
+    "Jonah": ["jnh", "jon"],
+    "Micah": ["mic", "mc"],
+    "Nahum": ["nah"],
+    "Habakkuk": ["hab", "hb"],
+    "Zephaniah": ["zeph", "zep", "zp"],
+    "Haggai": ["hag", "hg"],
+    "Zechariah": ["zech", "zec", "zc"],
+    "Malachi": ["mal", "ml"],
+    "Matthew": ["matt", "mat", "mt"],
+    "Mark": ["mrk", "mk"],
+    "Luke": ["luk", "lk"],
+    "John": ["jhn", "jn"],
+    "Acts": ["act"],
+    "Romans": ["rom", "rm"],
+    "Corinthians": ["cor"],
+    "Galatians": ["gal"],
+    "Ephesians": ["eph", "ephes"],
+    "Philippians": ["phil", "php"],
+    "Colossians": ["col"],
+    "Thessalonians": ["thess", "thes"],
+    "Timothy": ["tim"],
+    "Titus": ["tit"],
+    "Philemon": ["philem", "phm"],
+    "Hebrews": ["heb"],
+    "James": ["jas", "jm"],
+    "Peter": ["pet", "pt"],
+    "Jude": ["jud", "jd"],
+    "Revelation": ["rev"],
+}
+
+NUMBER_PREFIXES = {
+    1: ["1", "i", "1st", "first"],
+    2: ["2", "ii", "2nd", "second"],
+    3: ["3", "iii", "3rd", "third"],
+}
+
+SINGLE_CHAPTER_BOOKS = {"Obadiah", "Philemon", "2 John", "3 John", "Jude"}
+
+ORDINAL_BOOK = 1_000_000
+ORDINAL_CHAPTER = 1_000
+
+
+def normalize_book(name: str) -> str:
+    cleaned = name.replace(".", " ")
+    return " ".join(cleaned.strip().lower().split())
+
+
+CANONICAL_INDEX = {
+    normalize_book(name): index
+    for index, name in enumerate(CANONICAL_BOOKS)
+}
+
+
+def canonical_sort_key(name: str):
+    normalized = normalize_book(name)
+    normalized = BOOK_ALIASES.get(normalized, normalized)
+    index = CANONICAL_INDEX.get(normalized)
+    return (index is None, index if index is not None else 999, name)
+
+
+def _book_names() -> dict[str, str]:
+    """
+    Every accepted spelling (normalized) -> canonical book name.
+    """
+    names: dict[str, str] = {}
+
+    for book in CANONICAL_BOOKS:
+        number, _, base = book.partition(" ")
+        if number.isdigit() and base:
+            bases = [base.lower()] + ABBREVIATIONS.get(base, [])
+            for prefix in NUMBER_PREFIXES[int(number)]:
+                for variant in bases:
+                    names.setdefault(f"{prefix} {variant}", book)
+                    if prefix.isdigit():
+                        names.setdefault(f"{prefix}{variant}", book)
+        else:
+            names.setdefault(book.lower(), book)
+            for variant in ABBREVIATIONS.get(book, []):
+                names.setdefault(variant, book)
+
+    for alias, target in BOOK_ALIASES.items():
+        names.setdefault(alias, CANONICAL_BOOKS[CANONICAL_INDEX[target]])
+
+    return names
+
+
+BOOK_NAMES = _book_names()
+
+
+def resolve_book(name: str) -> str | None:
+    """
+    Map any accepted spelling or abbreviation to its canonical name.
+    """
+    return BOOK_NAMES.get(normalize_book(name))
+
+
+def book_index(name: str) -> int | None:
+    """
+    1-based canonical index of a book (Genesis = 1), or None if unknown.
+    """
+    book = resolve_book(name)
+    if book is None:
+        return None
+    return CANONICAL_INDEX[normalize_book(book)] + 1
+
+
+def book_at(index: int) -> str:
+    return CANONICAL_BOOKS[index - 1]
+
+
+def verse_ordinal(book: str, chapter: int, verse: int) -> int | None:
+    index = book_index(book)
+    if index is None:
+        return None
+    return index * ORDINAL_BOOK + chapter * ORDINAL_CHAPTER + verse
+
+
+def split_ordinal(ordinal: int) -> tuple[str, int, int]:
+    """
+    Inverse of verse_ordinal: (canonical book, chapter, verse).
+    """
+    index, rest = divmod(ordinal, ORDINAL_BOOK)
+    chapter, verse = divmod(rest, ORDINAL_CHAPTER)
+    return book_at(index), chapter, verse
+
+
+@dataclass(frozen=True)
+class ScriptureRange:
+    """
+    An inclusive passage within one book. A None verse means the whole
+    chapter (from its start, or to its end).
+    """
+    book: str
+    start_chapter: int
+    start_verse: int | None
+    end_chapter: int
+    end_verse: int | None
+
+    @property
+    def start_ordinal(self) -> int:
+        return verse_ordinal(self.book, self.start_chapter, self.start_verse or 0)
+
+    @property
+    def end_ordinal(self) -> int:
+        end_verse = self.end_verse if self.end_verse is not None else ORDINAL_CHAPTER - 1
+        return verse_ordinal(self.book, self.end_chapter, end_verse)
+
+    @property
+    def is_single_verse(self) -> bool:
+        return (
+            self.start_verse is not None
+            and self.start_chapter == self.end_chapter
+            and self.start_verse == self.end_verse
+        )
+
+    def __str__(self) -> str:
+        start = f"{self.book} {self.start_chapter}"
+        if self.start_verse is not None:
+            start = f"{start}:{self.start_verse}"
+
+        if self.is_single_verse or (
+            self.start_verse is None
+            and self.end_verse is None
+            and self.start_chapter == self.end_chapter
+        ):
+            return start
+        if self.end_chapter == self.start_chapter and self.end_verse is not None:
+            return f"{start}-{self.end_verse}"
+        if self.end_verse is None:
+            return f"{start}-{self.end_chapter}"
+        return f"{start}-{self.end_chapter}:{self.end_verse}"
+
+
+_NAME_PATTERN = "|".join(
+    r"\s*".join(re.escape(part) for part in name.split())
+    for name in sorted(BOOK_NAMES, key=len, reverse=True)
+)
+_SEGMENT = r"\d{1,3}(?:\s*:\s*\d{1,3})?(?:\s*[-–—]\s*\d{1,3}(?:\s*:\s*\d{1,3})?)?"
+
+# A list continues while the next number isn't the prefix of another book
+# ("Rom 8:28; 1 Cor 13" is two references, not Romans 1)
+_NEXT_BOOK = rf"(?!(?:{_NAME_PATTERN})(?![A-Za-z]))"
+
+REFERENCE_PATTERN = re.compile(
+    rf"(?<![A-Za-z0-9])(?P<book>{_NAME_PATTERN})\.?\s*"
+    rf"(?P<refs>{_SEGMENT}(?:\s*[,;]\s*{_NEXT_BOOK}{_SEGMENT})*)(?![\d:])",
+    re.IGNORECASE
+)
+SEGMENT_PATTERN = re.compile(
+    r"(?P<sep>[,;])?\s*(?P<c1>\d+)(?:\s*:\s*(?P<v1>\d+))?"
+    r"(?:\s*[-–—]\s*(?P<c2>\d+)(?:\s*:\s*(?P<v2>\d+))?)?"
+)
+
+
+def _parse_segments(book: str, refs: str) -> list[ScriptureRange]:
+    ranges = []
+    single_chapter = book in SINGLE_CHAPTER_BOOKS
+    chapter = None
+    in_verse_list = False
+
+    for match in SEGMENT_PATTERN.finditer(refs):
+        sep, c1, v1, c2, v2 = (
+            match.group("sep"), match.group("c1"), match.group("v1"),
+            match.group("c2"), match.group("v2")
+        )
+        a = int(c1)
+        b = int(c2) if c2 else None
+
+        if v1 is not None:
+            # "3:16", "3:16-18", "3:16-4:2"
+            chapter = a
+            start_verse = int(v1)
+            if b is None:
+                end_chapter, end_verse = chapter, start_verse
+            elif v2 is not None:
+                end_chapter, end_verse = b, int(v2)
+            else:
+                end_chapter, end_verse = chapter, b
+            ranges.append(ScriptureRange(book, chapter, start_verse, end_chapter, end_verse))
+            chapter = end_chapter
+            in_verse_list = True
+        elif single_chapter:
+            # "Jude 3", "Jude 3-5": bare numbers are verses
+            end = b if b is not None else a
+            ranges.append(ScriptureRange(book, 1, a, 1, end))
+            chapter, in_verse_list = 1, True
+        elif sep == "," and in_verse_list and chapter is not None:
+            # "John 3:16, 18" / "John 3:16, 18-20": more verses, same chapter
+            if v2 is not None:
+                ranges.append(ScriptureRange(book, chapter, a, b, int(v2)))
+                chapter = b
+            else:
+                end = b if b is not None else a
+                ranges.append(ScriptureRange(book, chapter, a, chapter, end))
+        else:
+            # "Rom 8", "John 3-4", "Rom 8-9:5"
+            end_chapter = b if b is not None else a
+            end_verse = int(v2) if v2 is not None else None
+            ranges.append(ScriptureRange(book, a, None, end_chapter, end_verse))
+            chapter, in_verse_list = end_chapter, end_verse is not None
+
+    return [
+        r for r in ranges
+        if r.start_chapter >= 1
+        and (r.end_chapter, r.end_verse or 0) >= (r.start_chapter, r.start_verse or 0)
+    ]
+
+
+def parse_references(text: str) -> list[ScriptureRange]:
+    """
+    Find every scripture reference in free text, e.g.
+    "Compare Rom 8:28-39; 1 Cor 13 and John 3:16, 18" ->
+    [Romans 8:28-39, 1 Corinthians 13, John 3:16, John 3:18].
+
+    Only real book names and abbreviations match, so phrases like
+    "verse 3" or "about 40" are not mistaken for references.
+    """
+    ranges = []
+    for match in REFERENCE_PATTERN.finditer(text):
+        book = resolve_book(match.group("book"))
+        if book is not None:
+            ranges.extend(_parse_segments(book, match.group("refs")))
+    return ranges
+
+
+def parse_reference(text: str) -> ScriptureRange | None:
+    """
+    The first reference in `text`, if any.
+    """
+    ranges = parse_references(text)
+    return ranges[0] if ranges else None
@@ -1,15 +1,54 @@
+import asyncio
+import logging
+from bisect import bisect_left, bisect_right
+
 from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
 
+from app.core.metrics import instrument
+from app.services.corpus import get_corpus
+from app.services.references import ScriptureRange, resolve_book, verse_ordinal
+from app.services.vector_index import CommentaryRow, ScoredVerseRow, get_vector_index
 
-def retrieve_commentary(
-    db,
+logger = logging.getLogger(__name__)
+
+# Cleared the first time commentary_docs.verse_span turns out to be missing
+_aligned_commentary_available = True
+
+# Postgres SQLSTATE for a reference to a column that doesn't exist
+UNDEFINED_COLUMN = "42703"
+
+
+def _sqlstate(exc) -> str | None:
+    """
+    SQLSTATE of a DBAPI error wrapped by SQLAlchemy (asyncpg's adapter
+    exposes `sqlstate`, psycopg2 `pgcode`).
+    """
+    orig = exc.orig
+    return (
+        getattr(orig, "sqlstate", None)
+        or getattr(orig, "pgcode", None)
+        or getattr(orig.__cause__, "sqlstate", None)
+    )
+
+
+def vector_literal(embedding) -> str:
+    """
+    pgvector text form ("[0.1,0.2,...]"), accepted by both psycopg2 and
+    asyncpg for `CAST(:embedding AS vector)`.
+    """
+    return "[" + ",".join(str(float(x)) for x in embedding) + "]"
+
+
+def _commentary_query(
     embedding,
-    limit: int = 18,
-    book: str | None = None,
-    chapter: int | None = None
+    limit: int,
+    book: str | None,
+    chapter: int | None
 ):
     sql = text("""
-        SELECT cd.content
+        SELECT cd.content,
+               1 - (ce.embedding <=> CAST(:embedding AS vector)) AS score
         FROM commentary_embeddings ce
         JOIN commentary_docs cd ON cd.id = ce.doc_id
         WHERE cd.source = 'adam_clarke'
@@ -23,7 +62,7 @@ def retrieve_commentary(
     ))
 
     params = {
-        "embedding": embedding,
+        "embedding": vector_literal(embedding),
         "limit": limit
     }
     if book:
@@ -31,42 +70,124 @@ def retrieve_commentary(
     if chapter:
         params["chapter"] = chapter
 
-    return db.execute(sql, params).fetchall()
+    return sql, params
 
 
-def retrieve_verses_by_reference(
-    db,
+def _aligned_commentary_query(start: int, end: int, limit: int):
+    """
+    Commentary whose verse_span (set by enrich_adam_clarke_metadata.py)
+    overlaps the ordinal range: a GiST index scan, no embedding needed.
+    """
+    sql = text("""
+        SELECT cd.id, cd.book, cd.chapter, cd.content
+        FROM commentary_docs cd
+        WHERE cd.source = 'adam_clarke'
+          AND cd.verse_span && int4range(:start, :end, '[]')
+        ORDER BY cd.id
+        LIMIT :limit
+    """)
+    return sql, {"start": start, "end": end, "limit": limit}
+
+
+def _verses_by_reference_query(
     book: str,
     chapter: int,
-    verse: int | None = None
+    verse: int | None
 ):
+    canonical = resolve_book(book)
+    if canonical is None:
+        # Not a book we know: match the stored name as given
+        sql = text(f"""
+            SELECT bv.book, bv.chapter, bv.verse, bv.text
+            FROM bible_verses bv
+            WHERE bv.version_code = 'KJV'
+              AND bv.book = :book
+              AND bv.chapter = :chapter
+              { "AND bv.verse = :verse" if verse else "" }
+            ORDER BY bv.verse
+        """)
+
+        params = {"book": book, "chapter": chapter}
+        if verse:
+            params["verse"] = verse
+
+        return sql, params
+
+    passage = ScriptureRange(canonical, chapter, verse or None, chapter, verse or None)
+    return _passage_query([passage])
+
+
+def _ordinal_ranges(passages: list[ScriptureRange], params: dict) -> str:
+    for i, passage in enumerate(passages):
+        params[f"start_{i}"] = passage.start_ordinal
+        params[f"end_{i}"] = passage.end_ordinal
+
+    return " OR ".join(
+        f"bv.ordinal BETWEEN :start_{i} AND :end_{i}"
+        for i in range(len(passages))
+    )
+
+
+def _passage_query(passages: list[ScriptureRange], version: str = "KJV"):
+    """
+    One ordered scan over the ordinal index covering every passage.
+    """
+    params = {"version": version}
     sql = text(f"""
-        SELECT bv.book, bv.chapter, bv.verse, bv.text
+        SELECT bv.id, bv.book, bv.chapter, bv.verse, bv.text, bv.ordinal
         FROM bible_verses bv
-        WHERE bv.version_code = 'KJV'
-          AND bv.book = :book
-          AND bv.chapter = :chapter
-          { "AND bv.verse = :verse" if verse else "" }
-        ORDER BY bv.verse
+        WHERE bv.version_code = :version
+          AND ({_ordinal_ranges(passages, params)})
+        ORDER BY bv.ordinal
     """)
 
-    params = {"book": book, "chapter": chapter}
-    if verse:
-        params["verse"] = verse
+    return sql, params
 
-    return db.execute(sql, params).fetchall()
 
+def _parallel_query(passages: list[ScriptureRange], versions: list[str]):
+    """
+    Every requested version of every passage in one scan of the
+    (ordinal, version_code) index, in verse order.
+    """
+    params = {f"version_{i}": version for i, version in enumerate(versions)}
+    placeholders = ", ".join(f":version_{i}" for i in range(len(versions)))
+    sql = text(f"""
+        SELECT bv.id, bv.book, bv.chapter, bv.verse, bv.text, bv.ordinal,
+               bv.version_code
+        FROM bible_verses bv
+        WHERE ({_ordinal_ranges(passages, params)})
+          AND bv.version_code IN ({placeholders})
+        ORDER BY bv.ordinal, bv.version_code
+    """)
+
+    return sql, params
 
-def retrieve_verses(
-    db,
+
+def _split_passages(passages: list[ScriptureRange], rows) -> list[list]:
+    """
+    Slice ordinal-ordered rows back into one list per requested passage
+    (overlapping passages each get their own copy).
+    """
+    ordinals = [r.ordinal for r in rows]
+    return [
+        rows[
+            bisect_left(ordinals, passage.start_ordinal):
+            bisect_right(ordinals, passage.end_ordinal)
+        ]
+        for passage in passages
+    ]
+
+
+def _verses_query(
     embedding,
     book: str | None,
     chapter: int | None,
-    verse: int | None = None,
-    limit: int = 6
+    verse: int | None,
+    limit: int
 ):
     sql = text(f"""
-        SELECT bv.book, bv.chapter, bv.verse, bv.text
+        SELECT bv.book, bv.chapter, bv.verse, bv.text,
+               1 - (be.embedding <=> CAST(:embedding AS vector)) AS score
         FROM bible_verse_embeddings be
         JOIN bible_verses bv ON bv.id = be.verse_id
         WHERE bv.version_code = 'KJV'
@@ -77,7 +198,7 @@ def retrieve_verses(
         LIMIT :limit
     """)
 
-    params = {"embedding": embedding, "limit": limit}
+    params = {"embedding": vector_literal(embedding), "limit": limit}
     if book:
         params["book"] = book
     if chapter:
@@ -85,4 +206,365 @@ def retrieve_verses(
     if verse:
         params["verse"] = verse
 
+    return sql, params
+
+
+def _search_commentary_index(index, embedding, limit, book, chapter):
+    positions, scores = index.search(
+        embedding,
+        limit,
+        mask=index.mask(book=book, chapter=chapter)
+    )
+    return index.commentary_rows(positions, scores)
+
+
+def _search_verse_index(index, embedding, limit, book, chapter, verse):
+    positions, scores = index.search(
+        embedding,
+        limit,
+        mask=index.mask(book=book, chapter=chapter, verse=verse)
+    )
+    return index.verse_rows(positions, scores)
+
+
+def _search_many_query(
+    target: str,
+    embeddings,
+    limit: int,
+    books: list[str] | None,
+    chapter: int | None
+):
+    """
+    Top `limit` rows for every query vector in one statement: a LATERAL
+    index scan per row of a VALUES list. Rows come back grouped by query
+    index (`idx`), best first.
+    """
+    params = {"limit": limit}
+    values = []
+    for i, embedding in enumerate(embeddings):
+        params[f"q_{i}"] = vector_literal(embedding)
+        values.append(f"({i}, CAST(:q_{i} AS vector))")
+
+    filters = []
+    if target == "verses":
+        select = """
+            SELECT bv.id, bv.book, bv.chapter, bv.verse, bv.text,
+                   1 - (be.embedding <=> q.embedding) AS score
+            FROM bible_verse_embeddings be
+            JOIN bible_verses bv ON bv.id = be.verse_id
+            WHERE bv.version_code = 'KJV'
+        """
+        order = "be.embedding <=> q.embedding"
+        columns = "hit.id, hit.book, hit.chapter, hit.verse, hit.text, hit.score"
+        if books:
+            # A book or a testament: one contiguous ordinal range
+            filters.append("AND bv.ordinal BETWEEN :lo AND :hi")
+            params["lo"] = verse_ordinal(books[0], chapter or 0, 0)
+            params["hi"] = verse_ordinal(books[-1], chapter or 999, 999)
+    else:
+        select = """
+            SELECT cd.id, cd.book, cd.chapter, cd.content,
+                   1 - (ce.embedding <=> q.embedding) AS score
+            FROM commentary_embeddings ce
+            JOIN commentary_docs cd ON cd.id = ce.doc_id
+            WHERE cd.source = 'adam_clarke'
+        """
+        order = "ce.embedding <=> q.embedding"
+        columns = "hit.id, hit.book, hit.chapter, hit.content, hit.score"
+        if books:
+            names = ", ".join(f":book_{i}" for i in range(len(books)))
+            filters.append(f"AND cd.book IN ({names})")
+            params.update({f"book_{i}": book for i, book in enumerate(books)})
+        if chapter:
+            filters.append("AND cd.chapter = :chapter")
+            params["chapter"] = chapter
+
+    sql = text(f"""
+        SELECT q.idx, {columns}
+        FROM (VALUES {", ".join(values)}) AS q(idx, embedding)
+        CROSS JOIN LATERAL (
+            {select}
+            {" ".join(filters)}
+            ORDER BY {order}
+            LIMIT :limit
+        ) hit
+        ORDER BY q.idx, hit.score DESC
+    """)
+
+    return sql, params
+
+
+def _search_many_index(index, target, embeddings, limit, books, chapter):
+    mask = index.books_mask(books, chapter) if books else index.mask(chapter=chapter)
+    positions, scores = index.search_many(embeddings, limit, mask)
+    rows = index.verse_rows if target == "verses" else index.commentary_rows
+    return [rows(p, s) for p, s in zip(positions, scores)]
+
+
+@instrument("search_many")
+def search_many(
+    db,
+    target: str,
+    embeddings,
+    limit: int,
+    books: list[str] | None = None,
+    chapter: int | None = None
+):
+    """
+    Semantic top-`limit` "verses" or "commentary" for a batch of query
+    embeddings (one list of scored rows per query, best first), with one
+    matrix multiply per block of queries or one SQL round-trip.
+
+    `books` restricts to canonical book names in canonical order, which must
+    be contiguous (a single book or a testament).
+    """
+    if not len(embeddings):
+        return []
+
+    index = get_vector_index(target)
+    if index is not None:
+        return _search_many_index(index, target, embeddings, limit, books, chapter)
+
+    sql, params = _search_many_query(target, embeddings, limit, books, chapter)
+    make_row = ScoredVerseRow if target == "verses" else CommentaryRow
+    results = [[] for _ in embeddings]
+    for idx, *columns in db.execute(sql, params):
+        results[idx].append(make_row(*columns))
+    return results
+
+
+@instrument("retrieve_commentary")
+def retrieve_commentary(
+    db,
+    embedding,
+    limit: int = 18,
+    book: str | None = None,
+    chapter: int | None = None
+):
+    index = get_vector_index("commentary")
+    if index is not None:
+        return _search_commentary_index(index, embedding, limit, book, chapter)
+
+    sql, params = _commentary_query(embedding, limit, book, chapter)
+    return db.execute(sql, params).fetchall()
+
+
+@instrument("retrieve_verses_by_reference")
+def retrieve_verses_by_reference(
+    db,
+    book: str,
+    chapter: int,
+    verse: int | None = None
+):
+    corpus = get_corpus("KJV")
+    if corpus is not None:
+        return corpus.verses(book, chapter, verse)
+
+    sql, params = _verses_by_reference_query(book, chapter, verse)
+    return db.execute(sql, params).fetchall()
+
+
+@instrument("retrieve_passage")
+def retrieve_passage(db, passages: list[ScriptureRange], version: str = "KJV"):
+    """
+    Verses for each passage (a list of row lists, in request order), from
+    the in-memory corpus or one range query.
+    """
+    if not passages:
+        return []
+
+    corpus = get_corpus(version)
+    if corpus is not None:
+        return [corpus.passage(p) for p in passages]
+
+    sql, params = _passage_query(passages, version)
+    return _split_passages(passages, db.execute(sql, params).fetchall())
+
+
+def _align(rows) -> list[tuple[int, dict]]:
+    """
+    (ordinal, {version: row}) per verse, in verse order, from
+    (ordinal, version, row) items sorted by ordinal.
+    """
+    aligned: dict[int, dict] = {}
+    for ordinal, version, row in rows:
+        aligned.setdefault(ordinal, {})[version] = row
+    return list(aligned.items())
+
+
+@instrument("retrieve_parallel")
+def retrieve_parallel(db, passages: list[ScriptureRange], versions: list[str]):
+    """
+    The given versions of each passage aligned verse by verse: per passage
+    a list of (ordinal, {version: row}), in verse order. A verse missing
+    from a version simply has no entry for it. Served from memory when
+    every version is loaded, otherwise by one query.
+    """
+    if not passages or not versions:
+        return []
+
+    corpora = [(version, get_corpus(version)) for version in versions]
+    if all(corpus is not None for _, corpus in corpora):
+        return [
+            _align(sorted(
+                (
+                    (verse_ordinal(row.book, row.chapter, row.verse), version, row)
+                    for version, corpus in corpora
+                    for row in corpus.passage(passage)
+                ),
+                key=lambda item: item[0]
+            ))
+            for passage in passages
+        ]
+
+    sql, params = _parallel_query(passages, versions)
+    rows = db.execute(sql, params).fetchall()
+    return [
+        _align((row.ordinal, row.version_code, row) for row in chunk)
+        for chunk in _split_passages(passages, rows)
+    ]
+
+
+@instrument("retrieve_similar")
+def retrieve_similar(db, verse_id: int, limit: int):
+    """
+    Nearest verses to `verse_id` by embedding, best first, with their
+    scores: a primary-key range read of the table written by
+    scripts/build_similar_verses.py.
+    """
+    sql = text("""
+        SELECT bv.id, bv.book, bv.chapter, bv.verse, bv.text, s.score
+        FROM bible_verse_similar s
+        JOIN bible_verses bv ON bv.id = s.similar_id
+        WHERE s.verse_id = :verse_id
+        ORDER BY s.rank
+        LIMIT :limit
+    """)
+    return db.execute(sql, {"verse_id": verse_id, "limit": limit}).fetchall()
+
+
+@instrument("retrieve_verses")
+def retrieve_verses(
+    db,
+    embedding,
+    book: str | None,
+    chapter: int | None,
+    verse: int | None = None,
+    limit: int = 6
+):
+    index = get_vector_index("verses")
+    if index is not None:
+        return _search_verse_index(index, embedding, limit, book, chapter, verse)
+
+    sql, params = _verses_query(embedding, book, chapter, verse, limit)
     return db.execute(sql, params).fetchall()
+
+
+# ------------------------
+# Async variants (AsyncSession)
+# ------------------------
+
+@instrument("retrieve_commentary")
+async def retrieve_commentary_async(
+    db,
+    embedding,
+    limit: int = 18,
+    book: str | None = None,
+    chapter: int | None = None
+):
+    index = get_vector_index("commentary")
+    if index is not None:
+        return await asyncio.to_thread(
+            _search_commentary_index, index, embedding, limit, book, chapter
+        )
+
+    sql, params = _commentary_query(embedding, limit, book, chapter)
+    return (await db.execute(sql, params)).fetchall()
+
+
+@instrument("retrieve_aligned_commentary")
+async def retrieve_aligned_commentary_async(
+    db,
+    start: int,
+    end: int,
+    limit: int = 18
+):
+    """
+    Commentary aligned to the ordinal range, or [] (callers fall back to
+    vector search) when none is, including before the verse_span column
+    has been added.
+    """
+    global _aligned_commentary_available
+    if not _aligned_commentary_available:
+        return []
+
+    sql, params = _aligned_commentary_query(start, end, limit)
+    try:
+        return (await db.execute(sql, params)).fetchall()
+    except ProgrammingError as exc:
+        await db.rollback()
+        if _sqlstate(exc) != UNDEFINED_COLUMN:
+            # Anything else may be transient: fall back for this request only
+            logger.warning(
+                "Verse-aligned commentary lookup failed, using vector search: %s",
+                exc.orig.__class__.__name__
+            )
+            return []
+        _aligned_commentary_available = False
+        logger.warning(
+            "Verse-aligned commentary disabled (run the commentary_docs.verse_span "
+            "migration, then restart): %s",
+            exc.orig.__class__.__name__
+        )
+        return []
+
+
+@instrument("retrieve_verses_by_reference")
+async def retrieve_verses_by_reference_async(
+    db,
+    book: str,
+    chapter: int,
+    verse: int | None = None
+):
+    corpus = get_corpus("KJV")
+    if corpus is not None:
+        return corpus.verses(book, chapter, verse)
+
+    sql, params = _verses_by_reference_query(book, chapter, verse)
+    return (await db.execute(sql, params)).fetchall()
+
+
+@instrument("retrieve_passage")
+async def retrieve_passage_async(
+    db,
+    passages: list[ScriptureRange],
+    version: str = "KJV"
+):
+    if not passages:
+        return []
+
+    corpus = get_corpus(version)
+    if corpus is not None:
+        return [corpus.passage(p) for p in passages]
+
+    sql, params = _passage_query(passages, version)
+    return _split_passages(passages, (await db.execute(sql, params)).fetchall())
+
+
+@instrument("retrieve_verses")
+async def retrieve_verses_async(
+    db,
+    embedding,
+    book: str | None,
+    chapter: int | None,
+    verse: int | None = None,
+    limit: int = 6
+):
+    index = get_vector_index("verses")
+    if index is not None:
+        return await asyncio.to_thread(
+            _search_verse_index, index, embedding, limit, book, chapter, verse
+        )
+
+    sql, params = _verses_query(embedding, book, chapter, verse, limit)
+    return (await db.execute(sql, params)).fetchall()
@@ -0,0 +1,353 @@
+import json
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.corpus import VerseRow
+from app.services.references import resolve_book
+
+logger = logging.getLogger(__name__)
+
+# Width of the embedding model's vectors (all-MiniLM-L6-v2); only used to
+# shape an index built from no rows
+DIMENSIONS = 384
+
+# Queries scored per matrix multiply in search_many (bounds the score matrix)
+SEARCH_BLOCK = 32
+
+CommentaryRow = namedtuple("CommentaryRow", ["id", "book", "chapter", "content", "score"])
+ScoredVerseRow = namedtuple("ScoredVerseRow", [*VerseRow._fields, "score"])
+
+
+class VectorIndex:
+    """
+    Contiguous float32 embedding matrix with parallel metadata arrays.
+
+    Rows are unit-normalized, so cosine similarity is a dot product and
+    ranking by it matches pgvector's `<=>` (cosine distance) ordering.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        ids: np.ndarray,
+        books: np.ndarray,
+        chapters: np.ndarray,
+        verses: np.ndarray,
+        book_names: list[str],
+        texts: list[str]
+    ):
+        self.vectors = vectors
+        self.ids = ids
+        self.books = books
+        self.chapters = chapters
+        self.verses = verses
+        self.book_names = book_names
+        self.book_codes = {name: code for code, name in enumerate(book_names)}
+        self.texts = texts
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_rows(cls, rows, dimensions: int = DIMENSIONS):
+        """
+        Build from (id, book, chapter, verse, text, embedding) rows, where
+        embedding is pgvector's text form. With no rows the index is empty
+        (0 x dimensions).
+        """
+        ids, books, chapters, verses, texts = [], [], [], [], []
+        blocks, block = [], []
+        book_codes: dict[str, int] = {}
+
+        for row_id, book, chapter, verse, row_text, embedding in rows:
+            code = book_codes.setdefault(book or "", len(book_codes))
+            ids.append(row_id)
+            books.append(code)
+            chapters.append(chapter or 0)
+            verses.append(verse or 0)
+            texts.append(row_text or "")
+            block.append(json.loads(embedding))
+
+            # Convert in blocks so we never hold every vector as Python floats
+            if len(block) == 4096:
+                blocks.append(np.asarray(block, dtype=np.float32))
+                block = []
+
+        if block:
+            blocks.append(np.asarray(block, dtype=np.float32))
+        if not blocks:
+            blocks.append(np.empty((0, dimensions), dtype=np.float32))
+
+        matrix = np.vstack(blocks) if len(blocks) > 1 else blocks[0]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+
+        return cls(
+            vectors=matrix,
+            ids=np.asarray(ids, dtype=np.int64),
+            books=np.asarray(books, dtype=np.int16),
+            chapters=np.asarray(chapters, dtype=np.int16),
+            verses=np.asarray(verses, dtype=np.int16),
+            book_names=list(book_codes),
+            texts=texts
+        )
+
+    def save(self, directory: Path, name: str) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / f"{name}.vectors.npy", self.vectors)
+        np.savez(
+            directory / f"{name}.meta.npz",
+            ids=self.ids,
+            books=self.books,
+            chapters=self.chapters,
+            verses=self.verses
+        )
+        with open(directory / f"{name}.json", "w", encoding="utf-8") as f:
+            json.dump({"book_names": self.book_names, "texts": self.texts}, f)
+
+    @classmethod
+    def load(cls, directory: Path, name: str):
+        """
+        Load a snapshot; the matrix is memory-mapped so restarts are fast and
+        workers on one box share the page cache.
+        """
+        vectors = np.load(directory / f"{name}.vectors.npy", mmap_mode="r")
+        meta = np.load(directory / f"{name}.meta.npz")
+        with open(directory / f"{name}.json", encoding="utf-8") as f:
+            extra = json.load(f)
+
+        return cls(
+            vectors=vectors,
+            ids=meta["ids"],
+            books=meta["books"],
+            chapters=meta["chapters"],
+            verses=meta["verses"],
+            book_names=extra["book_names"],
+            texts=extra["texts"]
+        )
+
+    def mask(
+        self,
+        book: str | None = None,
+        chapter: int | None = None,
+        verse: int | None = None
+    ) -> np.ndarray | None:
+        """
+        Boolean row filter for the given book/chapter/verse, or None when no
+        filter applies.
+        """
+        mask = None
+        if book:
+            code = self.book_codes.get(book)
+            mask = self.books == (code if code is not None else -1)
+        if chapter:
+            chapter_mask = self.chapters == chapter
+            mask = chapter_mask if mask is None else mask & chapter_mask
+        if verse:
+            verse_mask = self.verses == verse
+            mask = verse_mask if mask is None else mask & verse_mask
+        return mask
+
+    def books_mask(self, books, chapter: int | None = None) -> np.ndarray:
+        """
+        Boolean row filter for any of `books` (canonical names; stored
+        names are matched through resolve_book), optionally one chapter.
+        """
+        wanted = set(books)
+        codes = [
+            code for name, code in self.book_codes.items()
+            if resolve_book(name) in wanted
+        ]
+        mask = np.isin(self.books, codes)
+        if chapter:
+            mask &= self.chapters == chapter
+        return mask
+
+    def search_many(self, queries, limit: int, mask: np.ndarray | None = None):
+        """
+        Top `limit` rows for each query: (positions, scores), each of shape
+        (len(queries), k), best first. Queries are scored in blocks with one
+        matrix multiply each.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(len(queries), -1)
+        positions = np.arange(len(self.ids)) if mask is None else np.flatnonzero(mask)
+        matrix = self.vectors if mask is None else self.vectors[positions]
+
+        k = min(limit, len(positions))
+        if k <= 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        top_positions, top_scores = [], []
+        for start in range(0, len(queries), SEARCH_BLOCK):
+            scores = queries[start:start + SEARCH_BLOCK] @ matrix.T
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            best = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-best, axis=1, kind="stable")
+            top_positions.append(positions[np.take_along_axis(top, order, axis=1)])
+            top_scores.append(np.take_along_axis(best, order, axis=1))
+
+        return np.vstack(top_positions), np.vstack(top_scores)
+
+    def all_neighbours(self, k: int, block: int = 512, workers: int | None = None):
+        """
+        Top `k` other rows for every row: (positions, scores), each of shape
+        (len(self), k), best first. Rows are scored `block` at a time, so
+        each worker holds one block x len(self) score matrix; blocks run on
+        a thread pool (matmul and partitioning release the GIL).
+        """
+        n = len(self.ids)
+        k = min(k, n - 1)
+        positions = np.empty((n, max(k, 0)), dtype=np.int32)
+        scores = np.empty((n, max(k, 0)), dtype=np.float32)
+        if k <= 0:
+            return positions, scores
+
+        def score_block(start: int) -> None:
+            stop = min(start + block, n)
+            block_scores = self.vectors[start:stop] @ self.vectors.T
+            # A row is not its own neighbour
+            block_scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+            top = np.argpartition(-block_scores, k - 1, axis=1)[:, :k]
+            best = np.take_along_axis(block_scores, top, axis=1)
+            order = np.argsort(-best, axis=1, kind="stable")
+            positions[start:stop] = np.take_along_axis(top, order, axis=1)
+            scores[start:stop] = np.take_along_axis(best, order, axis=1)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(score_block, range(0, n, block)))
+
+        return positions, scores
+
+    def search(self, embedding, limit: int, mask: np.ndarray | None = None):
+        """
+        Return (positions, scores) of the top `limit` rows by cosine
+        similarity, best first.
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+
+        if mask is None:
+            positions = np.arange(len(self.ids))
+            scores = self.vectors @ query
+        else:
+            positions = np.flatnonzero(mask)
+            scores = self.vectors[positions] @ query
+
+        k = min(limit, len(scores))
+        if k <= 0:
+            return positions[:0], scores[:0]
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return positions[top], scores[top]
+
+    def commentary_rows(self, positions, scores) -> list[CommentaryRow]:
+        return [
+            CommentaryRow(
+                int(self.ids[p]),
+                self.book_names[self.books[p]],
+                int(self.chapters[p]),
+                self.texts[p],
+                float(score)
+            )
+            for p, score in zip(positions, scores)
+        ]
+
+    def verse_rows(self, positions, scores) -> list[ScoredVerseRow]:
+        return [
+            ScoredVerseRow(
+                int(self.ids[p]),
+                self.book_names[self.books[p]],
+                int(self.chapters[p]),
+                int(self.verses[p]),
+                self.texts[p],
+                float(score)
+            )
+            for p, score in zip(positions, scores)
+        ]
+
+
+COMMENTARY_SQL = text("""
+    SELECT cd.id, cd.book, cd.chapter, NULL AS verse, cd.content,
+           ce.embedding::text
+    FROM commentary_embeddings ce
+    JOIN commentary_docs cd ON cd.id = ce.doc_id
+    WHERE cd.source = 'adam_clarke'
+    ORDER BY cd.id
+""")
+
+VERSES_SQL = text("""
+    SELECT bv.id, bv.book, bv.chapter, bv.verse, bv.text,
+           be.embedding::text
+    FROM bible_verse_embeddings be
+    JOIN bible_verses bv ON bv.id = be.verse_id
+    WHERE bv.version_code = 'KJV'
+    ORDER BY bv.id
+""")
+
+INDEX_QUERIES = {
+    "commentary": COMMENTARY_SQL,
+    "verses": VERSES_SQL,
+}
+
+_indexes: dict[str, VectorIndex] = {}
+
+
+def build_vector_index(db, directory: Path) -> None:
+    """
+    Snapshot both embedding tables from Postgres into `directory`.
+    """
+    for name, sql in INDEX_QUERIES.items():
+        rows = db.execute(sql.execution_options(yield_per=5000))
+        index = VectorIndex.from_rows(rows)
+        index.save(directory, name)
+        logger.info("Wrote %s vectors to the %s snapshot", len(index), name)
+
+
+def get_vector_index(name: str) -> VectorIndex | None:
+    """
+    Return the in-memory index ("commentary" or "verses"), or None when the
+    pgvector backend is in use.
+    """
+    return _indexes.get(name)
+
+
+def load_configured_vector_index() -> None:
+    """
+    With RETRIEVAL_BACKEND=numpy, memory-map the snapshot in
+    VECTOR_INDEX_DIR, building it from Postgres first if it is missing.
+    """
+    if settings.RETRIEVAL_BACKEND != "numpy":
+        return
+
+    directory = Path(settings.VECTOR_INDEX_DIR)
+    missing = [
+        name for name in INDEX_QUERIES
+        if not (directory / f"{name}.vectors.npy").exists()
+    ]
+
+    if missing:
+        db = SessionLocal()
+        try:
+            build_vector_index(db, directory)
+        except Exception as exc:
+            # Any failure (database, empty or malformed embeddings, disk)
+            # leaves search on pgvector rather than stopping startup
+            logger.warning(
+                "Vector index build skipped, using pgvector: %s: %s",
+                exc.__class__.__name__,
+                exc
+            )
+            return
+        finally:
+            db.close()
+
+    for name in INDEX_QUERIES:
+        _indexes[name] = VectorIndex.load(directory, name)
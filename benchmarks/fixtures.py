@@ -0,0 +1,330 @@
+"""
+Synthetic fixture database for benchmarks, plus a thin shim that lets the
+app's Postgres SQL run on SQLite.
+
+The shim rewrites the few Postgres-only constructs the hot paths use
+(`<=>` cosine distance on pgvector, `LATERAL` top-k joins, `&&` range
+overlap, `@@` full-text match, `ILIKE`, `::text` casts) and registers
+`cosine_distance()`, `now()`, `int4range()` and a word-matching
+`ts_rank_cd()` as SQLite functions. Embeddings are stored in pgvector's
+text form ("[0.1,0.2,...]").
+"""
+import functools
+import json
+import random
+import re
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import event
+
+from app.services.references import CANONICAL_BOOKS, parse_references, verse_ordinal
+from app.services.vector_index import VectorIndex
+
+DIMENSIONS = 384
+
+SCHEMA = [
+    """
+    CREATE TABLE bible_verses (
+        id INTEGER PRIMARY KEY,
+        version_code TEXT NOT NULL,
+        book TEXT NOT NULL,
+        chapter INTEGER NOT NULL,
+        verse INTEGER NOT NULL,
+        text TEXT,
+        ordinal INTEGER
+    )
+    """,
+    "CREATE INDEX bible_verses_lookup ON bible_verses (version_code, book, chapter, verse)",
+    "CREATE INDEX bible_verses_ordinal_idx ON bible_verses (version_code, ordinal)",
+    "CREATE INDEX bible_verses_parallel_idx ON bible_verses (ordinal, version_code)",
+    """
+    CREATE TABLE bible_verse_embeddings (
+        verse_id INTEGER PRIMARY KEY,
+        embedding TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE bible_verse_similar (
+        verse_id INTEGER NOT NULL,
+        rank INTEGER NOT NULL,
+        similar_id INTEGER NOT NULL,
+        score REAL NOT NULL,
+        PRIMARY KEY (verse_id, rank)
+    )
+    """,
+    """
+    CREATE TABLE commentary_docs (
+        id INTEGER PRIMARY KEY,
+        source TEXT NOT NULL,
+        book TEXT,
+        chapter INTEGER,
+        content TEXT,
+        verse_span TEXT
+    )
+    """,
+    "CREATE INDEX commentary_docs_lookup ON commentary_docs (source, book, chapter)",
+    """
+    CREATE TABLE commentary_embeddings (
+        doc_id INTEGER PRIMARY KEY,
+        embedding TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE study_notes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        content TEXT NOT NULL,
+        tags TEXT,
+        tag_list TEXT NOT NULL DEFAULT '[]',
+        verse_ref TEXT,
+        created_at TIMESTAMP DEFAULT (now()),
+        updated_at TIMESTAMP DEFAULT (now()),
+        search_vector TEXT GENERATED ALWAYS AS (lower(title || ' ' || content)) VIRTUAL
+    )
+    """,
+    """
+    CREATE TABLE study_note_ranges (
+        note_id INTEGER NOT NULL,
+        span TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX study_note_ranges_note_idx ON study_note_ranges (note_id)",
+]
+
+WORDS = (
+    "and the lord said unto him behold I am with thee whither soever thou "
+    "goest for God so loved the world that he gave his only begotten son "
+    "grace faith hope charity law covenant spirit light darkness shepherd"
+).split()
+
+
+def _now():
+    return datetime.now().isoformat(sep=" ")
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_vector(value: str) -> np.ndarray:
+    return np.array(value.strip("[]").split(","), dtype=np.float32)
+
+
+def _cosine_distance(left: str, right: str) -> float:
+    a = _parse_vector(left)
+    b = _parse_vector(right)
+    denominator = float(np.linalg.norm(a) * np.linalg.norm(b)) or 1.0
+    return 1.0 - float(a @ b) / denominator
+
+
+# Return TIMESTAMP columns as datetimes, like psycopg2 does (the database
+# URL must set detect_types, see benchmarks/run.py)
+sqlite3.register_converter(
+    "TIMESTAMP",
+    lambda value: datetime.fromisoformat(value.decode())
+)
+
+
+# Postgres arrays (e.g. study_notes.tag_list) are stored as JSON text
+sqlite3.register_adapter(list, json.dumps)
+
+
+# int4range values are stored as "start,end" (inclusive) text
+def _int4range(start: int, end: int, bounds: str) -> str:
+    return f"{start},{end}"
+
+
+def _ranges_overlap(span: str | None, start: int, end: int) -> bool:
+    if span is None:
+        return False
+    low, high = map(int, span.split(","))
+    return low <= end and start <= high
+
+
+# Full-text search is approximated by words: a note matches when it has
+# every query word, ranked by how often they occur
+def _query_words(query: str) -> list[str]:
+    return re.findall(r"\w+", query.lower())
+
+
+def _ts_match(document: str, query: str) -> bool:
+    words = set(re.findall(r"\w+", document))
+    return all(word in words for word in _query_words(query))
+
+
+def _ts_rank(document: str, query: str) -> float:
+    words = re.findall(r"\w+", document)
+    return float(sum(words.count(word) for word in _query_words(query))) / (len(words) or 1)
+
+
+def register_functions(connection) -> None:
+    connection.create_function("cosine_distance", 2, _cosine_distance)
+    connection.create_function("now", 0, _now)
+    connection.create_function("int4range", 3, _int4range)
+    connection.create_function("ranges_overlap", 3, _ranges_overlap)
+    connection.create_function("ts_match", 2, _ts_match)
+    connection.create_function("ts_rank_cd", 2, _ts_rank)
+
+
+# search_many's `CROSS JOIN LATERAL (... LIMIT n)` over a VALUES list of
+# query vectors, as a CTE plus a row_number() window per query
+LATERAL_TOP_K = (
+    re.compile(
+        r"SELECT q\.idx, (?P<columns>.*?)\s+"
+        r"FROM \(VALUES (?P<values>.*?)\) AS q\(idx, embedding\)\s+"
+        r"CROSS JOIN LATERAL \(\s*SELECT (?P<select>.*?)\s+FROM (?P<source>.*?)\s+"
+        r"ORDER BY (?P<order>.*?)\s+LIMIT (?P<limit>\?)\s*\) hit",
+        re.DOTALL
+    ),
+    r"WITH q(idx, embedding) AS (VALUES \g<values>) "
+    r"SELECT q.idx, \g<columns> FROM q JOIN ("
+    r"SELECT q.idx AS hit_idx, \g<select>, "
+    r"row_number() OVER (PARTITION BY q.idx ORDER BY \g<order>) AS hit_rank "
+    r"FROM q, \g<source>"
+    r") hit ON hit.hit_idx = q.idx AND hit.hit_rank <= \g<limit>"
+)
+
+REWRITES = [
+    LATERAL_TOP_K,
+    (re.compile(r"([\w.]+)\s*<=>\s*CAST\((\?) AS vector\)"), r"cosine_distance(\1, \2)"),
+    (re.compile(r"([\w.]+)\s*<=>\s*([\w.]+)"), r"cosine_distance(\1, \2)"),
+    (re.compile(r"CAST\((\?) AS vector\)"), r"\1"),
+    (
+        re.compile(r"([\w.]+)\s*&&\s*int4range\((\?),\s*(\?),\s*'\[\]'\)"),
+        r"ranges_overlap(\1, \2, \3)"
+    ),
+    (re.compile(r"websearch_to_tsquery\('english', (\?)\)"), r"(SELECT \1 AS query)"),
+    (re.compile(r"(\w+)\s*@@\s*(\w+)"), r"ts_match(\1, \2)"),
+    (re.compile(r"\bILIKE\b", re.IGNORECASE), "LIKE"),
+    (re.compile(r"::text\b"), ""),
+]
+
+
+def translate(statement: str) -> str:
+    for pattern, replacement in REWRITES:
+        statement = pattern.sub(replacement, statement)
+    return statement
+
+
+def install_shim(engine) -> None:
+    """
+    Attach the SQL rewriter and SQLite functions to a sync Engine (for an
+    AsyncEngine pass `async_engine.sync_engine`).
+    """
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        register_functions(dbapi_connection)
+
+    @event.listens_for(engine, "before_cursor_execute", retval=True)
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        return translate(statement), parameters
+
+
+def _random_vector(rng: random.Random) -> str:
+    values = [rng.gauss(0, 1) for _ in range(DIMENSIONS)]
+    norm = sum(v * v for v in values) ** 0.5
+    return "[" + ",".join(f"{v / norm:.6f}" for v in values) + "]"
+
+
+def _sentence(rng: random.Random, length: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + "."
+
+
+def build_fixture_db(
+    path: str,
+    chapters_per_book: int = 5,
+    verses_per_chapter: int = 20,
+    commentary_per_chapter: int = 4,
+    notes: int = 2000,
+    versions: tuple[str, ...] = ("KJV", "WEB"),
+    similar_per_verse: int = 20,
+    seed: int = 7
+) -> dict:
+    """
+    Create and seed a SQLite database at `path`; returns row counts.
+    """
+    rng = random.Random(seed)
+    db = sqlite3.connect(path)
+    register_functions(db)
+    for statement in SCHEMA:
+        db.execute(statement)
+
+    verses, verse_embeddings, docs, doc_embeddings = [], [], [], []
+    for book in CANONICAL_BOOKS:
+        for chapter in range(1, chapters_per_book + 1):
+            for verse in range(1, verses_per_chapter + 1):
+                # Only the first version has embeddings, as in production
+                for i, version in enumerate(versions):
+                    verse_id = len(verses) + 1
+                    verses.append(
+                        (
+                            verse_id, version, book, chapter, verse, _sentence(rng, 24),
+                            verse_ordinal(book, chapter, verse)
+                        )
+                    )
+                    if i == 0:
+                        verse_embeddings.append((verse_id, _random_vector(rng)))
+            # The first doc is chapter-level; the rest are aligned to
+            # consecutive verse slices, leaving the last verses unaligned
+            step = max(1, verses_per_chapter // commentary_per_chapter)
+            for j in range(commentary_per_chapter):
+                doc_id = len(docs) + 1
+                content = " ".join(_sentence(rng, 30) for _ in range(6))
+                span = None
+                if j:
+                    span = _int4range(
+                        verse_ordinal(book, chapter, (j - 1) * step + 1),
+                        verse_ordinal(book, chapter, j * step),
+                        "[]"
+                    )
+                docs.append((doc_id, "adam_clarke", book, chapter, content, span))
+                doc_embeddings.append((doc_id, _random_vector(rng)))
+
+    db.executemany("INSERT INTO bible_verses VALUES (?, ?, ?, ?, ?, ?, ?)", verses)
+    db.executemany("INSERT INTO bible_verse_embeddings VALUES (?, ?)", verse_embeddings)
+
+    # Same computation as scripts/build_similar_verses.py
+    index = VectorIndex.from_rows(
+        (verse_id, None, None, None, None, embedding)
+        for verse_id, embedding in verse_embeddings
+    )
+    positions, scores = index.all_neighbours(similar_per_verse)
+    similar = [
+        (int(index.ids[row]), rank, int(index.ids[position]), float(score))
+        for row in range(len(index))
+        for rank, (position, score) in enumerate(zip(positions[row], scores[row]), start=1)
+    ]
+    db.executemany("INSERT INTO bible_verse_similar VALUES (?, ?, ?, ?)", similar)
+    db.executemany("INSERT INTO commentary_docs VALUES (?, ?, ?, ?, ?, ?)", docs)
+    db.executemany("INSERT INTO commentary_embeddings VALUES (?, ?)", doc_embeddings)
+
+    note_rows = []
+    for _ in range(notes):
+        book = rng.choice(CANONICAL_BOOKS)
+        note_rows.append((
+            _sentence(rng, 4),
+            " ".join(_sentence(rng, 20) for _ in range(3)),
+            ",".join(rng.sample(WORDS, 2)),
+            f"{book} {rng.randint(1, chapters_per_book)}:{rng.randint(1, verses_per_chapter)}",
+        ))
+    db.executemany(
+        "INSERT INTO study_notes (title, content, tags, verse_ref) VALUES (?, ?, ?, ?)",
+        note_rows
+    )
+    db.executemany(
+        "INSERT INTO study_note_ranges VALUES (?, int4range(?, ?, '[]'))",
+        [
+            (note_id, p.start_ordinal, p.end_ordinal)
+            for note_id, row in enumerate(note_rows, start=1)
+            for p in parse_references(row[3])
+        ]
+    )
+
+    db.commit()
+    db.close()
+
+    return {
+        "verses": len(verses),
+        "similar_verses": len(similar),
+        "commentary_docs": len(docs),
+        "notes": len(note_rows),
+    }
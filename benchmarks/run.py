@@ -0,0 +1,352 @@
+"""
+Offline latency/throughput benchmark for the API.
+
+Boots `app.main:app` under uvicorn against a seeded SQLite fixture database
+(see benchmarks/fixtures.py), with a stub LLM of configurable latency and,
+by default, a deterministic stub embedding model, then drives each scenario
+at several concurrency levels and writes machine-readable results. Needs
+httpx and aiosqlite on top of requirements.txt:
+
+    pip install httpx aiosqlite
+    python -m benchmarks.run --concurrency 1 8 32 --requests 300 \
+        --output bench_output.json
+
+Compare two commits by running it on each and diffing the JSON.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+SCENARIOS = [
+    "verses",
+    "verses_passage",
+    "verses_parallel",
+    "verses_similar",
+    "metadata_books",
+    "metadata_chapters",
+    "metadata_verses",
+    "commentary",
+    "notes_list",
+    "notes_search",
+    "notes_passage",
+    "notes_create",
+    "search",
+    "ai_study",
+    "ai_study_stream",
+]
+
+SEARCH_QUERIES = [
+    "grace and faith",
+    "the light shineth in darkness",
+    "the lord is my shepherd",
+    "love thy neighbour",
+    "covenant with Abraham",
+    "hope of the resurrection",
+    "the law and the prophets",
+    "born of the spirit",
+]
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class StubEncoder:
+    """
+    Deterministic stand-in for SentenceTransformer: hashes each text to a
+    unit vector, with an optional fixed per-batch cost.
+    """
+
+    def __init__(self, batch_latency: float, dimensions: int = 384):
+        self.batch_latency = batch_latency
+        self.dimensions = dimensions
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=True, **kwargs):
+        import numpy as np
+
+        if self.batch_latency:
+            time.sleep(self.batch_latency)
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+            vector = np.random.default_rng(seed).normal(size=self.dimensions)
+            vectors.append(vector / np.linalg.norm(vector))
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def install_stubs(llm_latency: float, embed_latency: float, real_model: bool):
+    import app.services.embeddings as embeddings
+    import app.services.llm as llm
+
+    async def stub_ask_llm(prompt: str) -> str:
+        await asyncio.sleep(llm_latency)
+        return f"Stub answer ({len(prompt)} prompt chars)."
+
+    async def stub_stream_llm(prompt: str):
+        for _ in range(10):
+            await asyncio.sleep(llm_latency / 10)
+            yield "token "
+
+    # Stub the Ollama calls only, so requests still go through the scheduler
+    llm._chat = stub_ask_llm
+    llm._chat_stream = stub_stream_llm
+
+    if not real_model:
+        encoder = StubEncoder(embed_latency)
+        embeddings.get_model = lambda: encoder
+
+
+def start_server(port: int):
+    import uvicorn
+
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(
+        app,
+        host="127.0.0.1",
+        port=port,
+        log_level="warning",
+        lifespan="on"
+    ))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    deadline = time.time() + 60
+    while not server.started:
+        if time.time() > deadline or not thread.is_alive():
+            raise RuntimeError("uvicorn did not start")
+        time.sleep(0.05)
+    return server, thread
+
+
+def make_request(scenario: str, rng: random.Random, books: list[str], shape: dict):
+    book = rng.choice(books)
+    chapter = rng.randint(1, shape["chapters_per_book"])
+    verse = rng.randint(1, shape["verses_per_chapter"])
+
+    if scenario == "verses":
+        return "GET", "/verses/", {"params": {"book": book, "chapter": chapter}}
+    if scenario == "verses_passage":
+        last = min(chapter + 1, shape["chapters_per_book"])
+        ref = f"{book} {chapter}:{verse}-{last}:{verse}; {rng.choice(books)} {chapter}"
+        return "GET", "/verses/passage", {"params": {"ref": ref}}
+    if scenario == "verses_parallel":
+        return "GET", "/verses/parallel", {"params": {
+            "ref": f"{book} {chapter}",
+            "versions": "KJV,WEB",
+        }}
+    if scenario == "verses_similar":
+        verse_id = rng.choice(shape["verse_ids"])
+        return "GET", f"/verses/{verse_id}/similar", {}
+    if scenario == "metadata_books":
+        return "GET", "/metadata/books", {}
+    if scenario == "metadata_chapters":
+        return "GET", "/metadata/chapters", {"params": {"book": book}}
+    if scenario == "metadata_verses":
+        return "GET", "/metadata/verses", {"params": {"book": book, "chapter": chapter}}
+    if scenario == "commentary":
+        return "GET", "/commentary/", {"params": {"book": book, "chapter": chapter}}
+    if scenario == "notes_list":
+        return "GET", "/notes/", {"params": {"limit": 50}}
+    if scenario == "notes_search":
+        return "GET", "/notes/search", {"params": {"q": rng.choice(["grace", "faith", "light"])}}
+    if scenario == "notes_passage":
+        return "GET", "/notes/passage", {"params": {"ref": f"{book} {chapter}"}}
+    if scenario == "notes_create":
+        return "POST", "/notes/", {"json": {
+            "title": "Benchmark note",
+            "content": "Created by the benchmark suite.",
+            "tags": "bench",
+            "verse_ref": f"{book} {chapter}:{verse}",
+        }}
+    if scenario == "search":
+        return "POST", "/search/", {"json": {
+            "queries": rng.sample(SEARCH_QUERIES, 2),
+            "limit": 10,
+        }}
+    if scenario in ("ai_study", "ai_study_stream"):
+        path = "/ai/study/stream" if scenario == "ai_study_stream" else "/ai/study"
+        return "POST", path, {"json": {
+            "question": "What does this verse mean?",
+            "book": book,
+            "chapter": chapter,
+            "verse": verse,
+        }}
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+async def run_level(base_url, scenario, concurrency, total, books, shape, seed):
+    import httpx
+
+    rng = random.Random(seed)
+    requests = [make_request(scenario, rng, books, shape) for _ in range(total)]
+    latencies: list[float] = []
+    errors = 0
+    cursor = iter(requests)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+
+        async def worker():
+            nonlocal errors
+            for method, path, kwargs in cursor:
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, **kwargs)
+                    ok = response.status_code < 400
+                    # Streams report failures in-band after a 200
+                    if response.headers.get("content-type", "").startswith("text/event-stream"):
+                        ok = ok and b"event: error" not in response.content
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                if not ok:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "duration_s": round(elapsed, 4),
+        "requests_per_s": round(total / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    }
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            text=True,
+            stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and level")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="stub LLM seconds per answer")
+    parser.add_argument("--embed-latency", type=float, default=0.005, help="stub encoder seconds per batch")
+    parser.add_argument("--real-model", action="store_true", help="use the real SentenceTransformer")
+    parser.add_argument("--chapters-per-book", type=int, default=5)
+    parser.add_argument("--verses-per-chapter", type=int, default=20)
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bible-bench-")
+    db_path = os.path.join(workdir, "fixture.db")
+
+    # Settings are read at import time, so configure before importing app
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}?detect_types=1"
+    os.environ.setdefault("ANSWER_CACHE_BACKEND", "none")
+    os.environ.setdefault("EMBEDDING_CACHE_PATH", "")
+    sys.path.insert(0, str(ROOT))
+
+    from benchmarks.fixtures import build_fixture_db, install_shim
+    from app.services.references import CANONICAL_BOOKS
+    from app.core.database import async_engine, engine
+
+    shape = {
+        "chapters_per_book": args.chapters_per_book,
+        "verses_per_chapter": args.verses_per_chapter,
+    }
+    counts = build_fixture_db(db_path, notes=args.notes, seed=args.seed, **shape)
+    fixture = sqlite3.connect(db_path)
+    shape["verse_ids"] = [
+        verse_id for (verse_id,) in fixture.execute("SELECT DISTINCT verse_id FROM bible_verse_similar")
+    ]
+    fixture.close()
+    install_shim(engine)
+    install_shim(async_engine.sync_engine)
+    install_stubs(args.llm_latency, args.embed_latency, args.real_model)
+
+    server, thread = start_server(args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    results = []
+    try:
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                result = asyncio.run(run_level(
+                    base_url,
+                    scenario,
+                    concurrency,
+                    args.requests,
+                    CANONICAL_BOOKS,
+                    shape,
+                    args.seed
+                ))
+                results.append(result)
+                print(
+                    f"{scenario:<18} c={concurrency:<4} "
+                    f"p50={result['p50_ms']:>9.2f}ms p95={result['p95_ms']:>9.2f}ms "
+                    f"p99={result['p99_ms']:>9.2f}ms rps={result['requests_per_s']:>9} "
+                    f"errors={result['errors']}",
+                    file=sys.stderr
+                )
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "git_revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "llm_latency_s": args.llm_latency,
+            "embed_latency_s": args.embed_latency,
+            "real_model": args.real_model,
+            "requests_per_level": args.requests,
+            "chapters_per_book": shape["chapters_per_book"],
+            "verses_per_chapter": shape["verses_per_chapter"],
+        },
+        "fixture": counts,
+        "results": results,
+    }
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(payload + "\n")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 import { useMemo, useState } from "react"
-import { askAI } from "../../services/api"
+import { askAIStream } from "../../services/api"
 
 interface Props {
   book: string
@@ -34,16 +34,29 @@ export function AIAssistantPanel({ book, chapter, verse }: Props) {
     setMessages(prev => [...prev, { role: "user", text: trimmed }])
 
     try {
-      const res = await askAI({
-        book,
-        chapter,
-        verse: verse ?? undefined,
-        question: trimmed,
-      })
-      setMessages(prev => [
-        ...prev,
-        { role: "assistant", text: res.answer },
-      ])
+      let started = false
+      await askAIStream(
+        {
+          book,
+          chapter,
+          verse: verse ?? undefined,
+          question: trimmed,
+        },
+        token => {
+          if (!started) {
+            started = true
+            setMessages(prev => [...prev, { role: "assistant", text: token }])
+            return
+          }
+          setMessages(prev => {
+            const last = prev[prev.length - 1]
+            return [
+              ...prev.slice(0, -1),
+              { ...last, text: last.text + token },
+            ]
+          })
+        }
+      )
     } catch (err) {
       const message =
         err instanceof Error
@@ -17,6 +17,29 @@ export async function fetchVerses(
   return res.json()
 }
 
+export async function fetchPassage(ref: string) {
+  const res = await fetch(
+    `${API_BASE}/verses/passage?ref=${encodeURIComponent(ref)}`
+  )
+  if (!res.ok) throw new Error("Failed to fetch passage")
+  return res.json()
+}
+
+export async function fetchParallel(ref: string, versions: string[]) {
+  const params = new URLSearchParams({ ref, versions: versions.join(",") })
+  const res = await fetch(`${API_BASE}/verses/parallel?${params.toString()}`)
+  if (!res.ok) throw new Error("Failed to fetch parallel verses")
+  return res.json()
+}
+
+export async function fetchSimilar(verseId: number, limit = 10) {
+  const res = await fetch(
+    `${API_BASE}/verses/${verseId}/similar?limit=${limit}`
+  )
+  if (!res.ok) throw new Error("Failed to fetch similar verses")
+  return res.json()
+}
+
 export async function fetchCommentary(book: string, chapter: number) {
   const res = await fetch(
     `${API_BASE}/commentary/?book=${encodeURIComponent(book)}&chapter=${chapter}`
@@ -90,6 +113,58 @@ export async function askAI(payload: {
   return res.json()
 }
 
+export async function askAIStream(
+  payload: {
+    book: string
+    chapter: number
+    verse?: number
+    question: string
+  },
+  onToken: (text: string) => void,
+  signal?: AbortSignal
+) {
+  const res = await fetch(`${API_BASE}/ai/study/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(payload),
+    signal,
+  })
+  if (!res.ok || !res.body) {
+    const text = await res.text()
+    throw new Error(text || "AI request failed")
+  }
+
+  const reader = res.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ""
+
+  while (true) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    let boundary = buffer.indexOf("\n\n")
+    while (boundary !== -1) {
+      const block = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      boundary = buffer.indexOf("\n\n")
+
+      let event = "message"
+      let data = ""
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7)
+        else if (line.startsWith("data: ")) data += line.slice(6)
+      }
+
+      if (event === "token") {
+        onToken(JSON.parse(data).text)
+      } else if (event === "error") {
+        throw new Error(JSON.parse(data).detail || "AI request failed")
+      }
+    }
+  }
+}
+
 export interface StudyNote {
   id: number
   title: string
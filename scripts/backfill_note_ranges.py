@@ -0,0 +1,55 @@
+"""
+Populate `study_note_ranges` from each note's free-text verse_ref.
+
+New and edited notes are indexed by the API; run this once after creating
+the table:
+
+    python scripts/backfill_note_ranges.py
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.core.database import SessionLocal  # noqa: E402
+from app.services.references import parse_references  # noqa: E402
+
+
+def main():
+    db = SessionLocal()
+    try:
+        notes = db.execute(text("""
+            SELECT id, verse_ref
+            FROM study_notes
+            WHERE verse_ref IS NOT NULL
+        """)).fetchall()
+
+        ranges, unparsed = [], 0
+        for note in notes:
+            passages = parse_references(note.verse_ref)
+            if not passages:
+                unparsed += 1
+            ranges.extend(
+                {"note_id": note.id, "start": p.start_ordinal, "end": p.end_ordinal}
+                for p in passages
+            )
+
+        db.execute(text("DELETE FROM study_note_ranges"))
+        if ranges:
+            db.execute(text("""
+                INSERT INTO study_note_ranges (note_id, span)
+                VALUES (:note_id, int4range(:start, :end, '[]'))
+            """), ranges)
+        db.commit()
+    finally:
+        db.close()
+
+    print(f"✅ Stored {len(ranges)} ranges for {len(notes) - unparsed} notes")
+    if unparsed:
+        print(f"⚠️  {unparsed} notes have a verse_ref with no recognizable reference")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Fill `bible_verses.ordinal` (book index * 1,000,000 + chapter * 1,000 +
+verse) from the canonical book table in app/services/references.py.
+
+Run once after adding the column, and again after ingesting new text:
+
+    python scripts/backfill_verse_ordinals.py
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.core.database import SessionLocal  # noqa: E402
+from app.services.references import (  # noqa: E402
+    ORDINAL_BOOK,
+    ORDINAL_CHAPTER,
+    book_index
+)
+
+
+def main():
+    db = SessionLocal()
+    try:
+        books = db.execute(text("SELECT DISTINCT book FROM bible_verses")).scalars().all()
+
+        params, unknown = [], []
+        for book in books:
+            index = book_index(book)
+            if index is None:
+                unknown.append(book)
+            else:
+                params.append({"book": book, "base": index * ORDINAL_BOOK})
+
+        # One UPDATE per stored book name; each is a single indexed pass
+        if params:
+            db.execute(text(f"""
+                UPDATE bible_verses
+                SET ordinal = :base + chapter * {ORDINAL_CHAPTER} + verse
+                WHERE book = :book
+            """), params)
+        db.commit()
+    finally:
+        db.close()
+
+    print(f"✅ Ordinals set for {len(params)} books")
+    if unknown:
+        print(f"⚠️  Unrecognized book names (left NULL): {', '.join(sorted(unknown))}")
+
+
+if __name__ == "__main__":
+    main()
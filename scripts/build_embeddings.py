@@ -0,0 +1,392 @@
+"""
+Build or refresh commentary_embeddings / bible_verse_embeddings.
+
+Rows are streamed from Postgres with a server-side cursor, encoded in large
+batches across a pool of worker processes (each loads the model once) and
+bulk-loaded with COPY. Every vector is stored with the model that produced
+it and an md5 of its source text.
+
+Incremental (default): only rows that are new, whose text changed, or that
+were embedded with a different model are encoded; vectors for deleted rows
+are removed. Each batch commits on its own, so an interrupted run simply
+continues next time.
+
+    python scripts/build_embeddings.py commentary verses [--workers 4]
+
+Shadow (--shadow): build a complete copy into <table>_shadow, recreate the
+original table's indexes and foreign keys on it (defaults and CHECK
+constraints are copied up front), then swap it in with renames inside one
+transaction. Use this to switch models without serving a half-updated
+table. Views or other tables' foreign keys that depend on the live table
+would block the swap, so the build refuses to start while any exist:
+
+    python scripts/build_embeddings.py commentary --model all-MiniLM-L12-v2 --shadow
+
+The shadow column keeps the live `vector(N)` type; for a model with a
+different output size pass it explicitly (e.g. `--model all-mpnet-base-v2
+--dimensions 768 --shadow`).
+
+Restart the API after switching models (queries must use the same model;
+see MODEL_NAME in app/services/embeddings.py) and rebuild the numpy
+snapshot if RETRIEVAL_BACKEND=numpy.
+"""
+import argparse
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import psycopg2
+from sqlalchemy.engine import make_url
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.config import settings  # noqa: E402
+from app.services.embeddings import MODEL_NAME  # noqa: E402
+
+TARGETS = {
+    "commentary": {
+        "table": "commentary_embeddings",
+        "key": "doc_id",
+        "source": """
+            SELECT cd.id, cd.content AS text
+            FROM commentary_docs cd
+            WHERE cd.source = 'adam_clarke'
+              AND coalesce(cd.content, '') <> ''
+        """,
+    },
+    "verses": {
+        "table": "bible_verse_embeddings",
+        "key": "verse_id",
+        "source": """
+            SELECT bv.id, bv.text
+            FROM bible_verses bv
+            WHERE bv.version_code = 'KJV'
+              AND coalesce(bv.text, '') <> ''
+        """,
+    },
+}
+
+
+# =========================
+# WORKERS
+# =========================
+
+_worker_model = None
+
+
+def _init_worker(model_name: str) -> None:
+    global _worker_model
+    from sentence_transformers import SentenceTransformer
+
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode(texts: list[str]) -> list[str]:
+    """
+    Encode in a worker; returns pgvector text literals (cheap to pickle and
+    ready for COPY).
+    """
+    vectors = _worker_model.encode(
+        texts,
+        batch_size=64,
+        normalize_embeddings=True,
+        show_progress_bar=False
+    )
+    return [
+        "[" + ",".join(f"{x:.8g}" for x in vector.tolist()) + "]"
+        for vector in vectors
+    ]
+
+
+def content_hash(text: str) -> str:
+    # Same value as Postgres md5(text) for UTF-8 databases
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+# =========================
+# DATABASE
+# =========================
+
+def connect():
+    url = make_url(settings.DATABASE_URL).set(drivername="postgresql")
+    return psycopg2.connect(url.render_as_string(hide_password=False))
+
+
+def pending_sql(target: dict, incremental: bool) -> str:
+    if not incremental:
+        return f"SELECT id, text FROM ({target['source']}) src ORDER BY id"
+
+    return f"""
+        SELECT src.id, src.text
+        FROM ({target['source']}) src
+        LEFT JOIN {target['table']} e ON e.{target['key']} = src.id
+        WHERE e.{target['key']} IS NULL
+           OR e.content_hash IS DISTINCT FROM md5(src.text)
+           OR e.model_name IS DISTINCT FROM %(model)s
+        ORDER BY src.id
+    """
+
+
+def copy_rows(cur, table: str, key: str, rows) -> None:
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(str(value) for value in row) + "\n")
+    buffer.seek(0)
+    cur.copy_expert(
+        f"COPY {table} ({key}, embedding, model_name, content_hash) FROM STDIN",
+        buffer
+    )
+
+
+def upsert_batch(conn, target: dict, rows) -> None:
+    """
+    COPY into the session's staging table, then one upsert into the target.
+    """
+    table, key = target["table"], target["key"]
+    with conn.cursor() as cur:
+        copy_rows(cur, "embedding_staging", key, rows)
+        cur.execute(f"""
+            INSERT INTO {table} ({key}, embedding, model_name, content_hash)
+            SELECT {key}, embedding, model_name, content_hash
+            FROM embedding_staging
+            ON CONFLICT ({key}) DO UPDATE
+            SET embedding = EXCLUDED.embedding,
+                model_name = EXCLUDED.model_name,
+                content_hash = EXCLUDED.content_hash
+        """)
+    conn.commit()
+
+
+def prepare_incremental(conn, target: dict) -> None:
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TEMP TABLE embedding_staging
+            ON COMMIT DELETE ROWS
+            AS SELECT {target['key']}, embedding, model_name, content_hash
+               FROM {target['table']}
+            WITH NO DATA
+        """)
+    conn.commit()
+
+
+def prune_deleted(conn, target: dict) -> int:
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            DELETE FROM {target['table']} e
+            WHERE NOT EXISTS (
+                SELECT 1 FROM ({target['source']}) src
+                WHERE src.id = e.{target['key']}
+            )
+        """)
+        deleted = cur.rowcount
+    conn.commit()
+    return deleted
+
+
+def shadow_blockers(conn, table: str) -> list[str]:
+    """
+    Views and foreign keys that depend on `table`: dropping the replaced
+    table would fail (or, with CASCADE, silently take them with it).
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT DISTINCT 'view ' || v.oid::regclass::text
+            FROM pg_depend d
+            JOIN pg_rewrite r ON r.oid = d.objid
+            JOIN pg_class v ON v.oid = r.ev_class
+            WHERE d.classid = 'pg_rewrite'::regclass
+              AND d.refobjid = %s::regclass
+              AND v.oid <> d.refobjid
+            UNION ALL
+            SELECT 'foreign key ' || conname || ' on ' || conrelid::regclass::text
+            FROM pg_constraint
+            WHERE contype = 'f' AND confrelid = %s::regclass
+        """, (table, table))
+        return [name for (name,) in cur.fetchall()]
+
+
+def prepare_shadow(conn, target: dict, dimensions: int | None = None) -> str:
+    table = target["table"]
+    shadow = f"{table}_shadow"
+    blockers = shadow_blockers(conn, table)
+    if blockers:
+        sys.exit(
+            f"❌ {table} can't be swapped while these depend on it: "
+            f"{', '.join(blockers)}. Drop them, rebuild, then recreate them."
+        )
+
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {shadow}")
+        # Indexes are built after loading, which is much faster; foreign
+        # keys aren't copied by LIKE and are added in swap_shadow
+        cur.execute(f"CREATE TABLE {shadow} (LIKE {table} INCLUDING ALL EXCLUDING INDEXES)")
+        # LIKE copies the live vector(N); a model of another width needs its own
+        if dimensions:
+            cur.execute(f"ALTER TABLE {shadow} ALTER COLUMN embedding TYPE vector({int(dimensions)})")
+    conn.commit()
+    return shadow
+
+
+def swap_shadow(conn, target: dict, shadow: str) -> None:
+    """
+    Index the shadow table and give it the live table's foreign keys, then
+    swap them atomically.
+    """
+    table, key = target["table"], target["key"]
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT i.relname, pg_get_indexdef(x.indexrelid), x.indisprimary
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = %s::regclass
+        """, (table,))
+        indexes = cur.fetchall()
+
+        cur.execute("""
+            SELECT conname, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE conrelid = %s::regclass AND contype = 'f'
+        """, (table,))
+        foreign_keys = cur.fetchall()
+
+        cur.execute(f"ALTER TABLE {shadow} ADD CONSTRAINT {shadow}_pkey PRIMARY KEY ({key})")
+        for name, definition, is_primary in indexes:
+            if is_primary:
+                continue
+            # "CREATE INDEX x ON public.t USING ..." -> "... x_shadow ON public.t_shadow ..."
+            definition = re.sub(
+                rf"INDEX {name} ON (?:ONLY )?(\S+\.)?{table} USING",
+                rf"INDEX {name}_shadow ON \g<1>{shadow} USING",
+                definition,
+                count=1
+            )
+            print(f"  indexing: {definition}")
+            cur.execute(definition)
+        # Not index-backed, so the names can match the live table's
+        for name, definition in foreign_keys:
+            print(f"  constraint: {name} {definition}")
+            cur.execute(f"ALTER TABLE {shadow} ADD CONSTRAINT {name} {definition}")
+        conn.commit()
+
+        cur.execute("SET LOCAL lock_timeout = '10s'")
+        cur.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+        cur.execute(f"ALTER TABLE {shadow} RENAME TO {table}")
+        cur.execute(f"DROP TABLE {table}_old")
+        cur.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {shadow}_pkey TO {table}_pkey")
+        for name, _, is_primary in indexes:
+            if not is_primary:
+                cur.execute(f"ALTER INDEX {name}_shadow RENAME TO {name}")
+    conn.commit()
+
+
+# =========================
+# PIPELINE
+# =========================
+
+def batches(cur, size: int):
+    batch = []
+    for row_id, text in cur:
+        batch.append((row_id, text))
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build(name: str, args, executor) -> None:
+    target = TARGETS[name]
+    incremental = not args.shadow
+    print(f"▶ {name} → {target['table']} ({'incremental' if incremental else 'shadow rebuild'})")
+
+    read_conn = connect()
+    write_conn = connect()
+    started = time.perf_counter()
+    written = 0
+
+    try:
+        if incremental:
+            prepare_incremental(write_conn, target)
+            destination = None
+        else:
+            destination = prepare_shadow(write_conn, target, args.dimensions)
+
+        def write(batch, literals):
+            rows = [
+                (row_id, literal, args.model, content_hash(text))
+                for (row_id, text), literal in zip(batch, literals)
+            ]
+            if incremental:
+                upsert_batch(write_conn, target, rows)
+            else:
+                with write_conn.cursor() as cur:
+                    copy_rows(cur, destination, target["key"], rows)
+                write_conn.commit()
+
+        with read_conn.cursor(name=f"embed_{name}") as cur:
+            cur.itersize = args.batch_size
+            cur.execute(pending_sql(target, incremental), {"model": args.model})
+
+            # Keep a bounded number of batches in flight so memory stays flat
+            in_flight = []
+            for batch in batches(cur, args.batch_size):
+                in_flight.append((batch, executor.submit(_encode, [t for _, t in batch])))
+                if len(in_flight) > args.workers * 2:
+                    done, future = in_flight.pop(0)
+                    write(done, future.result())
+                    written += len(done)
+                    print(f"  {written} rows", end="\r", flush=True)
+
+            for done, future in in_flight:
+                write(done, future.result())
+                written += len(done)
+
+        if incremental:
+            deleted = prune_deleted(write_conn, target)
+            if deleted:
+                print(f"  removed {deleted} vectors for deleted rows")
+        else:
+            swap_shadow(write_conn, target, destination)
+    finally:
+        read_conn.close()
+        write_conn.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {name}: {written} vectors written in {elapsed:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("targets", nargs="+", choices=sorted(TARGETS))
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--batch-size", type=int, default=1024, help="rows per encode/COPY batch")
+    parser.add_argument("--shadow", action="store_true", help="full rebuild into a shadow table, then swap")
+    parser.add_argument("--dimensions", type=int, help="vector width of --model, if it differs from the live column (--shadow only)")
+    args = parser.parse_args()
+    if args.dimensions and not args.shadow:
+        parser.error("--dimensions requires --shadow (an incremental build keeps the live column)")
+
+    # spawn: forked workers and an already-initialised torch don't mix
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(args.model,)
+    ) as executor:
+        for name in args.targets:
+            build(name, args, executor)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Precompute the nearest verses to every KJV verse into bible_verse_similar,
+which /verses/{verse_id}/similar reads by primary key.
+
+All verse embeddings are loaded into one matrix and scored against each
+other in blocks (one matrix multiply per block, blocks spread over a
+thread pool), keeping the top --k per verse. The table is rebuilt under a
+new name and swapped in, so readers never see it half-written.
+
+Run after (re)building bible_verse_embeddings, then restart the API so
+the HTTP cache's content stamp (and cached responses) are refreshed:
+
+    python scripts/build_similar_verses.py [--k 20] [--block 512] [--workers 4]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+from sqlalchemy.engine import make_url
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import SessionLocal  # noqa: E402
+from app.services.vector_index import VERSES_SQL, VectorIndex  # noqa: E402
+
+TABLE = "bible_verse_similar"
+
+# Rows per COPY
+COPY_BATCH = 100_000
+
+
+def connect():
+    url = make_url(settings.DATABASE_URL).set(drivername="postgresql")
+    return psycopg2.connect(url.render_as_string(hide_password=False))
+
+
+def load_index() -> VectorIndex:
+    db = SessionLocal()
+    try:
+        rows = db.execute(VERSES_SQL.execution_options(yield_per=5000))
+        return VectorIndex.from_rows(rows)
+    finally:
+        db.close()
+
+
+def neighbour_rows(index: VectorIndex, positions, scores):
+    """
+    (verse_id, rank, similar_id, score) for every stored neighbour.
+    """
+    ids = index.ids
+    for row, (neighbours, row_scores) in enumerate(zip(positions, scores)):
+        verse_id = int(ids[row])
+        for rank, (position, score) in enumerate(zip(neighbours, row_scores), start=1):
+            yield verse_id, rank, int(ids[position]), f"{score:.6f}"
+
+
+def copy_rows(cur, table: str, rows) -> None:
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(str(value) for value in row) + "\n")
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} (verse_id, rank, similar_id, score) FROM STDIN", buffer)
+
+
+def write_table(conn, rows) -> int:
+    """
+    Load into {TABLE}_new, index it, then swap it in atomically.
+    """
+    staging = f"{TABLE}_new"
+    written = 0
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {staging}")
+        cur.execute(f"""
+            CREATE TABLE {staging} (
+                verse_id integer NOT NULL,
+                rank smallint NOT NULL,
+                similar_id integer NOT NULL,
+                score real NOT NULL
+            )
+        """)
+
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == COPY_BATCH:
+                copy_rows(cur, staging, batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            copy_rows(cur, staging, batch)
+            written += len(batch)
+
+        # Indexed after loading, which is much faster
+        cur.execute(
+            f"ALTER TABLE {staging} ADD CONSTRAINT {staging}_pkey "
+            "PRIMARY KEY (verse_id, rank)"
+        )
+        conn.commit()
+
+        cur.execute("SET LOCAL lock_timeout = '10s'")
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cur.execute(f"ALTER TABLE {staging} RENAME TO {TABLE}")
+        cur.execute(f"ALTER TABLE {TABLE} RENAME CONSTRAINT {staging}_pkey TO {TABLE}_pkey")
+    conn.commit()
+
+    with conn.cursor() as cur:
+        cur.execute(f"ANALYZE {TABLE}")
+    conn.commit()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--k", type=int, default=settings.SIMILAR_VERSES_K, help="neighbours per verse")
+    parser.add_argument("--block", type=int, default=512, help="verses scored per matrix multiply")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = load_index()
+    print(f"▶ {len(index)} verse embeddings loaded in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    positions, scores = index.all_neighbours(args.k, block=args.block, workers=args.workers)
+    print(f"  top {positions.shape[1]} neighbours computed in {time.perf_counter() - started:.1f}s")
+
+    conn = connect()
+    try:
+        written = write_table(conn, neighbour_rows(index, positions, scores))
+    finally:
+        conn.close()
+
+    print(f"✅ {written} rows written to {TABLE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Rebuild the in-memory retrieval snapshot (RETRIEVAL_BACKEND=numpy).
+
+Run after re-ingesting commentary or re-embedding, then restart the API:
+
+    python scripts/build_vector_index.py [--dir vector_index]
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import SessionLocal  # noqa: E402
+from app.services.vector_index import build_vector_index  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dir", default=settings.VECTOR_INDEX_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    db = SessionLocal()
+    try:
+        build_vector_index(db, Path(args.dir))
+    finally:
+        db.close()
+
+    print(f"✅ Vector index snapshot written to {args.dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Compare the ONNX embedding backend with the reference SentenceTransformer
+on a random sample of corpus texts (commentary and KJV verses).
+
+Reports per-text cosine similarity between the two encoders and how often
+each text's nearest neighbours within the sample agree (recall@k), and
+exits non-zero if the mean cosine is below --min-cosine:
+
+    python scripts/check_embedding_parity.py [--quantized] [--sample 500]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import SessionLocal  # noqa: E402
+from app.services.embeddings import MODEL_NAME, OnnxEncoder  # noqa: E402
+
+SAMPLE_SQL = {
+    "commentary": """
+        SELECT content FROM commentary_docs
+        WHERE source = 'adam_clarke' AND coalesce(content, '') <> ''
+        ORDER BY random() LIMIT :limit
+    """,
+    "verses": """
+        SELECT text FROM bible_verses
+        WHERE version_code = 'KJV' AND coalesce(text, '') <> ''
+        ORDER BY random() LIMIT :limit
+    """,
+}
+
+
+def sample_texts(size: int) -> list[str]:
+    db = SessionLocal()
+    try:
+        texts = []
+        for sql in SAMPLE_SQL.values():
+            texts.extend(db.execute(text(sql), {"limit": size // 2}).scalars())
+        return texts
+    finally:
+        db.close()
+
+
+def timed_encode(encoder, texts):
+    start = time.perf_counter()
+    vectors = np.asarray(encoder.encode(texts, batch_size=32, normalize_embeddings=True))
+    return vectors, time.perf_counter() - start
+
+
+def neighbours(vectors: np.ndarray, k: int) -> np.ndarray:
+    scores = vectors @ vectors.T
+    np.fill_diagonal(scores, -np.inf)
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dir", default=settings.EMBEDDING_ONNX_DIR)
+    parser.add_argument("--quantized", action="store_true", default=settings.EMBEDDING_ONNX_QUANTIZED)
+    parser.add_argument("--sample", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    texts = sample_texts(args.sample)
+    if len(texts) <= args.k:
+        sys.exit("Not enough corpus texts to sample")
+
+    reference, reference_seconds = timed_encode(SentenceTransformer(MODEL_NAME, device="cpu"), texts)
+    candidate, candidate_seconds = timed_encode(OnnxEncoder(args.dir, args.quantized), texts)
+
+    cosine = np.sum(reference * candidate, axis=1)
+    expected = neighbours(reference, args.k)
+    actual = neighbours(candidate, args.k)
+    recall = np.mean([
+        len(set(e) & set(a)) / args.k
+        for e, a in zip(expected, actual)
+    ])
+
+    label = "onnx-int8" if args.quantized else "onnx"
+    print(f"Texts: {len(texts)}  backend: {label}")
+    print(
+        f"Cosine vs reference: mean={cosine.mean():.5f} "
+        f"min={cosine.min():.5f} p1={np.percentile(cosine, 1):.5f} "
+        f"p5={np.percentile(cosine, 5):.5f}"
+    )
+    print(f"Neighbour recall@{args.k}: {recall:.4f}")
+    print(f"Encode time: reference={reference_seconds:.2f}s {label}={candidate_seconds:.2f}s")
+
+    if cosine.mean() < args.min_cosine:
+        sys.exit(f"❌ Mean cosine {cosine.mean():.5f} is below {args.min_cosine}")
+    print("✅ Parity OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,46 @@
+"""
+Assign book/chapter metadata, and verse ranges where Clarke marks them, to
+Adam Clarke commentary_docs rows.
+
+Rows are scanned in id order with a server-side cursor; "CHAPTER XIV."
+rows set the current chapter and "Romans 8:" style headers set the current
+book (any OT or NT book). "Verse 16." / "Verses 3-5." markers set the
+current verses: a row gets the verses it marks plus, unless it opens with a
+marker, the verses the previous marker was on (a note continued from the
+row before). The range is stored as verse ordinals in `verse_span`; on a
+database without that column (see the README) only book and chapter are
+written.
+
+Updates are written in batches through a staging table and a single
+UPDATE ... FROM per batch, each in its own transaction. After every batch
+a checkpoint records the last id and the running book/chapter/verses, so
+an interrupted run resumes where it stopped:
+
+    python scripts/enrich_adam_clarke_metadata.py --dry-run
+    python scripts/enrich_adam_clarke_metadata.py [--batch-size 5000] [--restart]
+"""
+import argparse
+import json
 import re
+import sys
+from collections import Counter
+from pathlib import Path
+
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import execute_values
+from sqlalchemy.engine import make_url
 
-# =========================
-# CONFIG
-# =========================
-DRY_RUN = False      # ← SET TO False TO COMMIT
-SOURCE = "adam_clarke"
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-DB_CONFIG = {
-    "dbname": "bible_db",
-    "user": "bible_user",
-    "password": "bible_pass",   # change if needed
-    "host": "localhost",
-    "port": 5432,
-}
+from app.core.config import settings  # noqa: E402
+from app.services.references import (  # noqa: E402
+    BOOK_ALIASES,
+    CANONICAL_BOOKS,
+    resolve_book,
+    verse_ordinal
+)
 
-# =========================
-# NT BOOKS (CANONICAL)
-# =========================
-NT_BOOKS = [
-    "Matthew", "Mark", "Luke", "John", "Acts",
-    "Romans", "1 Corinthians", "2 Corinthians",
-    "Galatians", "Ephesians", "Philippians", "Colossians",
-    "1 Thessalonians", "2 Thessalonians",
-    "1 Timothy", "2 Timothy", "Titus", "Philemon",
-    "Hebrews", "James", "1 Peter", "2 Peter",
-    "1 John", "2 John", "3 John", "Jude", "Revelation",
-]
+SOURCE = "adam_clarke"
 
 # =========================
 # REGEX (STRICT & SAFE)
@@ -35,18 +48,29 @@ NT_BOOKS = [
 
 # CHAPTER III.
 CHAPTER_PATTERN = re.compile(
-    r"^CHAPTER\s+([IVXLC]+)\.?",
+    r"^CHAPTER\s+([IVXLCDM]+)\.?",
     re.IGNORECASE,
 )
 
-# Matthew 1:
-# John 3:
+# Genesis 1:
+# Psalm 23:
 # Romans 8:
+BOOK_NAMES = sorted([*CANONICAL_BOOKS, *BOOK_ALIASES], key=len, reverse=True)
 BOOK_HEADER_PATTERN = re.compile(
-    r"^\s*(" + "|".join(re.escape(b) for b in NT_BOOKS) + r")\s+(\d+):",
+    r"^\s*(" + "|".join(re.escape(b) for b in BOOK_NAMES) + r")\s+(\d+):",
     re.IGNORECASE,
 )
 
+# Verse 16.
+# Verses 3-5.
+# Verses 1, 2.
+VERSE_PATTERN = re.compile(
+    r"(?:^|(?<=\s))Verses?\s+(\d{1,3})(?:\s*(?:-|–|,|and|to)\s*(\d{1,3}))?\.",
+)
+
+# Longest chapter (Psalm 119); larger numbers are not verse markers
+MAX_VERSE = 176
+
 # Footer / scrape junk indicators
 JUNK_PATTERNS = [
     "Site Tools",
@@ -61,44 +85,90 @@ JUNK_PATTERNS = [
 # =========================
 # ROMAN NUMERALS
 # =========================
-ROMAN_MAP = {
-    "I": 1, "II": 2, "III": 3, "IV": 4, "V": 5,
-    "VI": 6, "VII": 7, "VIII": 8, "IX": 9, "X": 10,
-    "XI": 11, "XII": 12, "XIII": 13, "XIV": 14,
-    "XV": 15, "XVI": 16, "XVII": 17, "XVIII": 18,
-    "XIX": 19, "XX": 20,
-}
+ROMAN_VALUES = {"I": 1, "V": 5, "X": 10, "L": 50, "C": 100, "D": 500, "M": 1000}
+ROMAN_PATTERN = re.compile(
+    r"^M{0,3}(CM|CD|D?C{0,3})(XC|XL|L?X{0,3})(IX|IV|V?I{0,3})$"
+)
 
 
 def roman_to_int(roman: str) -> int | None:
-    return ROMAN_MAP.get(roman.upper())
+    """
+    Parse a well-formed Roman numeral ("CXIX" -> 119); None otherwise.
+    """
+    roman = roman.upper()
+    if not roman or not ROMAN_PATTERN.match(roman):
+        return None
+
+    total = 0
+    for current, following in zip(roman, roman[1:] + " "):
+        value = ROMAN_VALUES[current]
+        if following != " " and value < ROMAN_VALUES[following]:
+            total -= value
+        else:
+            total += value
+    return total
 
 
 def is_junk(content: str) -> bool:
     return any(pat in content for pat in JUNK_PATTERNS)
 
 
-def main():
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+def verse_markers(content: str) -> list[tuple[int, int, int]]:
+    """
+    (position, first verse, last verse) of each "Verse N." marker.
+    """
+    markers = []
+    for match in VERSE_PATTERN.finditer(content):
+        first = int(match.group(1))
+        last = int(match.group(2) or first)
+        if 1 <= first <= last <= MAX_VERSE:
+            markers.append((match.start(), first, last))
+    return markers
 
-    cur.execute("""
-        SELECT id, content
-        FROM commentary_docs
-        WHERE source = %s
-        ORDER BY id
-    """, (SOURCE,))
 
-    rows = cur.fetchall()
+class MetadataTracker:
+    """
+    Running book/chapter/verse state while scanning docs in order.
+    """
 
-    current_book = None
-    current_chapter = None
-    updates = []
+    def __init__(
+        self,
+        book: str | None = None,
+        chapter: int | None = None,
+        verses: list[int] | None = None
+    ):
+        self.book = book
+        self.chapter = chapter
+        # (first, last) of the most recent verse marker in this chapter
+        self.verses = tuple(verses) if verses else None
 
-    for row in rows:
-        content = (row["content"] or "").strip()
+    def state(self) -> dict:
+        return {"book": self.book, "chapter": self.chapter, "verses": self.verses}
+
+    def _verse_range(self, content: str) -> tuple[int, int] | None:
+        markers = verse_markers(content)
+        ranges = [(first, last) for _, first, last in markers]
+        # Continued from the previous row (notes run in verse order)
+        if self.verses and (
+            not markers
+            or (markers[0][0] > 0 and markers[0][1] >= self.verses[0])
+        ):
+            ranges.insert(0, self.verses)
+        if markers:
+            self.verses = ranges[-1]
+        if not ranges:
+            return None
+        return min(first for first, _ in ranges), max(last for _, last in ranges)
+
+    def feed(self, content: str) -> tuple[str, int, tuple[int, int] | None] | None:
+        """
+        Consume one doc; return the (book, chapter, verses) it belongs to,
+        if known, where verses is a (first, last) pair or None for
+        chapter-level commentary.
+        """
+        content = (content or "").strip()
         if not content or is_junk(content):
-            continue
+            return None
 
         # -------------------------
         # CHAPTER DETECTION
@@ -107,43 +177,232 @@ def main():
         if chapter_match:
             chapter = roman_to_int(chapter_match.group(1))
             if chapter:
-                current_chapter = chapter
-            continue
+                self.chapter = chapter
+                self.verses = None
+            return None
 
         # -------------------------
         # BOOK DETECTION (STRICT)
         # -------------------------
         book_match = BOOK_HEADER_PATTERN.match(content)
         if book_match:
-            current_book = book_match.group(1)
-            # Do NOT continue — this row still belongs to the book/chapter
+            book = resolve_book(book_match.group(1))
+            if book != self.book:
+                self.verses = None
+            self.book = book
+            # Do NOT return — this row still belongs to the book/chapter
+
+        verses = self._verse_range(content)
+        if self.book and self.chapter:
+            return self.book, self.chapter, verses
+        return None
+
+
+# =========================
+# CHECKPOINTS
+# =========================
+
+def load_checkpoint(path: Path, source: str) -> dict | None:
+    if not path.exists():
+        return None
+    checkpoint = json.loads(path.read_text())
+    if checkpoint.get("source") != source:
+        return None
+    return checkpoint
 
-        # -------------------------
-        # ASSIGN METADATA
-        # -------------------------
-        if current_book and current_chapter:
-            updates.append((current_book, current_chapter, row["id"]))
 
-    print(f"Rows eligible for update: {len(updates)}")
+def save_checkpoint(path: Path, checkpoint: dict) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(checkpoint))
+    tmp.replace(path)
 
-    if DRY_RUN:
+
+# =========================
+# DATABASE
+# =========================
+
+def connect():
+    url = make_url(settings.DATABASE_URL).set(drivername="postgresql")
+    return psycopg2.connect(url.render_as_string(hide_password=False))
+
+
+def prepare_staging(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TEMP TABLE commentary_metadata_staging (
+                id INTEGER PRIMARY KEY,
+                book TEXT NOT NULL,
+                chapter INTEGER NOT NULL,
+                verse_start INTEGER,
+                verse_end INTEGER
+            ) ON COMMIT DELETE ROWS
+        """)
+    conn.commit()
+
+
+def has_verse_span(conn) -> bool:
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT 1
+            FROM information_schema.columns
+            WHERE table_name = 'commentary_docs'
+              AND column_name = 'verse_span'
+              AND table_schema = current_schema()
+        """)
+        return cur.fetchone() is not None
+
+
+def flush(
+    conn,
+    updates: list[tuple[int, str, int, int | None, int | None]],
+    verse_span: bool = True
+) -> int:
+    """
+    Stage one batch and apply it with a single UPDATE ... FROM, skipping
+    rows whose metadata is already correct (verse ranges only when the
+    `verse_span` column exists). Commits; returns rows changed.
+    """
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            "INSERT INTO commentary_metadata_staging "
+            "(id, book, chapter, verse_start, verse_end) VALUES %s",
+            updates,
+            page_size=len(updates)
+        )
+        cur.execute(f"""
+            UPDATE commentary_docs cd
+            SET book = s.book, chapter = s.chapter
+                {", verse_span = s.verse_span" if verse_span else ""}
+            FROM (
+                SELECT id, book, chapter,
+                       CASE WHEN verse_start IS NOT NULL
+                            THEN int4range(verse_start, verse_end, '[]')
+                       END AS verse_span
+                FROM commentary_metadata_staging
+            ) s
+            WHERE cd.id = s.id
+              AND (cd.book IS DISTINCT FROM s.book
+                   OR cd.chapter IS DISTINCT FROM s.chapter
+                   {"OR cd.verse_span IS DISTINCT FROM s.verse_span" if verse_span else ""})
+        """)
+        changed = cur.rowcount
+    conn.commit()
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--source", default=SOURCE)
+    parser.add_argument("--dry-run", action="store_true", help="report counts, write nothing")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--checkpoint", help="checkpoint file (default: .enrich_<source>.json)")
+    parser.add_argument("--restart", action="store_true", help="ignore any checkpoint")
+    args = parser.parse_args()
+
+    checkpoint_path = Path(args.checkpoint or f".enrich_{args.source}.json")
+    checkpoint = None
+    if not args.dry_run and not args.restart:
+        checkpoint = load_checkpoint(checkpoint_path, args.source)
+
+    tracker = MetadataTracker()
+    last_id = 0
+    per_book = Counter()
+    aligned = 0
+    changed = 0
+    if checkpoint:
+        tracker = MetadataTracker(
+            checkpoint["book"],
+            checkpoint["chapter"],
+            checkpoint.get("verses")
+        )
+        last_id = checkpoint["last_id"]
+        per_book.update(checkpoint["per_book"])
+        aligned = checkpoint.get("aligned", 0)
+        changed = checkpoint["changed"]
+        print(f"Resuming after id {last_id} ({tracker.book} {tracker.chapter})")
+
+    read_conn = connect()
+    write_conn = None if args.dry_run else connect()
+    verse_span = True
+    if write_conn:
+        prepare_staging(write_conn)
+        verse_span = has_verse_span(write_conn)
+        if not verse_span:
+            print("commentary_docs.verse_span is missing: writing book/chapter only")
+
+    updates = []
+    scanned = 0
+    samples = []
+
+    try:
+        # Named cursor = server-side: rows arrive itersize at a time
+        with read_conn.cursor(name="commentary_docs_scan") as cur:
+            cur.itersize = args.batch_size
+            cur.execute("""
+                SELECT id, content
+                FROM commentary_docs
+                WHERE source = %s
+                  AND id > %s
+                ORDER BY id
+            """, (args.source, last_id))
+
+            for doc_id, content in cur:
+                scanned += 1
+                last_id = doc_id
+                assigned = tracker.feed(content)
+                if assigned is None:
+                    continue
+
+                book, chapter, verses = assigned
+                per_book[book] += 1
+                verse_start = verse_end = None
+                if verses:
+                    aligned += 1
+                    verse_start = verse_ordinal(book, chapter, verses[0])
+                    verse_end = verse_ordinal(book, chapter, verses[1])
+                if len(samples) < 15:
+                    samples.append((doc_id, book, chapter, verses))
+                updates.append((doc_id, book, chapter, verse_start, verse_end))
+
+                if write_conn and len(updates) >= args.batch_size:
+                    changed += flush(write_conn, updates, verse_span)
+                    updates = []
+                    save_checkpoint(checkpoint_path, {
+                        "source": args.source,
+                        "last_id": last_id,
+                        **tracker.state(),
+                        "per_book": per_book,
+                        "aligned": aligned,
+                        "changed": changed,
+                    })
+                    print(f"… through id {last_id}: {sum(per_book.values())} assigned, {changed} changed")
+
+        if write_conn and updates:
+            changed += flush(write_conn, updates, verse_span)
+    finally:
+        read_conn.close()
+        if write_conn:
+            write_conn.close()
+
+    print(f"Rows scanned this run: {scanned}")
+    print(f"Rows with book/chapter: {sum(per_book.values())}")
+    print(f"Rows aligned to verses: {aligned}")
+    for book in sorted(per_book, key=CANONICAL_BOOKS.index):
+        print(f"  {book:<18} {per_book[book]}")
+
+    if args.dry_run:
         print("DRY RUN — no updates written")
         print("Sample updates:")
-        for u in updates[:15]:
-            print(u)
+        for sample in samples:
+            print(sample)
         return
 
-    # -------------------------
-    # COMMIT
-    # -------------------------
-    cur.executemany("""
-        UPDATE commentary_docs
-        SET book = %s, chapter = %s
-        WHERE id = %s
-    """, updates)
-
-    conn.commit()
-    print("✅ Adam Clarke NT metadata enrichment committed successfully")
+    checkpoint_path.unlink(missing_ok=True)
+    print(f"✅ Adam Clarke metadata enrichment committed ({changed} rows changed)")
 
 
 if __name__ == "__main__":
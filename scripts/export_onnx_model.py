@@ -0,0 +1,77 @@
+"""
+Export the embedding model (MODEL_NAME in app/services/embeddings.py) to
+ONNX for EMBEDDING_BACKEND=onnx, optionally with an int8-quantized copy.
+
+Needs torch/sentence-transformers at export time only; the API then needs
+just onnxruntime and tokenizers:
+
+    python scripts/export_onnx_model.py [--dir onnx_model] [--quantize]
+    python scripts/check_embedding_parity.py [--quantized]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.config import settings  # noqa: E402
+from app.services.embeddings import MODEL_NAME  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dir", default=settings.EMBEDDING_ONNX_DIR)
+    parser.add_argument("--quantize", action="store_true", help="also write model_quantized.onnx (int8)")
+    parser.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    directory = Path(args.dir)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    reference = SentenceTransformer(MODEL_NAME, device="cpu")
+    transformer = reference[0].auto_model.eval()
+    tokenizer = reference.tokenizer
+
+    # tokenizer.json is all the runtime needs (via the tokenizers package)
+    tokenizer.save_pretrained(str(directory))
+    with open(directory / "config.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": MODEL_NAME,
+            "max_seq_length": reference.max_seq_length,
+            "pad_token_id": tokenizer.pad_token_id or 0,
+        }, f, indent=2)
+
+    sample = tokenizer(["In the beginning God created the heaven and the earth."], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            str(directory / "model.onnx"),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=args.opset,
+        )
+    print(f"✅ Wrote {directory / 'model.onnx'}")
+
+    if args.quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(
+            str(directory / "model.onnx"),
+            str(directory / "model_quantized.onnx"),
+            weight_type=QuantType.QInt8
+        )
+        print(f"✅ Wrote {directory / 'model_quantized.onnx'}")
+
+
+if __name__ == "__main__":
+    main()